@@ -1,9 +1,32 @@
+import os
 import streamlit as st
-from app.data_collection import fetch_news, preprocess_news_data, fetch_article_content
-from app.category_classification import classify_news
-from app.sentiment_analysis import sentiment_analysis
-from app.ner_extraction import analyze_story
-from app.summarization import summarize_article
+from app.data_collection import fetch_news, fetch_article_content, prefetch_articles_content
+from app.analysis_pipeline import build_article_pipeline
+from app.model_registry import warm_models
+from app.backends import stage_model_name, MULTITASK_ENABLED
+from app.inference_server import get_inference_client
+from app.instrumentation import trace
+from app.dedup_index import drop_near_duplicates
+
+# Load the analysis models in the background while the user picks a topic
+# (only the spaCy pipelines when an inference server runs the transformer models)
+if 'models_warming' not in st.session_state:
+    local_models = ['sentencizer', 'spacy_lg']
+    if os.environ.get('NEWS_NER_COREF', '1') == '1':
+        local_models.append('stanza')
+    if not get_inference_client():
+        local_models.append(stage_model_name('summarization'))
+        if MULTITASK_ENABLED:
+            local_models.append('multitask')
+        else:
+            local_models += [stage_model_name(stage) for stage in ('classification', 'sentiment')]
+    st.session_state.models_warming = warm_models(local_models)
+
+# One analysis pipeline (and thread pool) shared by all sessions
+@st.cache_resource
+def get_article_pipeline():
+    return build_article_pipeline()
+
 # Streamlit App Setup
 st.title("Real-time News Article Classification")
 
@@ -13,7 +36,11 @@ fetch_button = st.button("Fetch News Articles")
 
 # Initialize session state for news articles if not already set
 if 'news_df' not in st.session_state or fetch_button:
-    st.session_state.news_df = fetch_news(query=query)
+    # Syndicated copies of the same story are shown (and analysed) once
+    st.session_state.news_df = drop_near_duplicates(fetch_news(query=query))
+    # Download every article body in the background while the user picks one
+    urls = st.session_state.news_df['url'].tolist() if not st.session_state.news_df.empty else []
+    st.session_state.article_prefetch = prefetch_articles_content(urls)
 
 if 'selected_article_content' not in st.session_state:
     st.session_state.selected_article_content = ""
@@ -38,7 +65,11 @@ else:
 
     # Fetch content using the selected article's URL if it is not already fetched
     if article_url != st.session_state.get('selected_article_url', None):
-        st.session_state.selected_article_content = fetch_article_content(article_url)
+        prefetched = st.session_state.get('article_prefetch', {}).get(article_url)
+        if prefetched is not None:
+            st.session_state.selected_article_content = prefetched.result()
+        else:
+            st.session_state.selected_article_content = fetch_article_content(article_url)
         st.session_state.selected_article_url = article_url  # Store the selected URL
 
     # Display the content of the selected article
@@ -49,34 +80,80 @@ else:
     # cleaned_article = preprocess_text(st.session_state.selected_article_content)
     # st.write("Cleaned Article Content:")
     # st.write(cleaned_article)
-    cleaned_article=summarize_article(st.session_state.selected_article_content,method="both")
+    # Steps 4-7 run as one concurrent pipeline; each section is filled in as soon as its stage finishes
     st.write("Summarized Article Content:")
     st.write("Extractive")
-    st.write(cleaned_article['extractive'])
+    extractive_placeholder = st.empty()
     st.write("Abstractive")
-    st.write(cleaned_article['abstractive'])
-    
-    # Step 5: Perform Classification
-    category = classify_news(cleaned_article['abstractive'])
-    st.write(f"Predicted Category: **{category}**")
-    
-    # Step 6: Sentiment Analysis
-    sentiment = sentiment_analysis(cleaned_article['abstractive'])
-    st.write(f"Sentiment Analysis: **{sentiment}**")
-    
-    # Step 7: Named Entity Recognition (NER)
-    entities = analyze_story(cleaned_article['abstractive'])
-    st.subheader("Named Entities Extracted:")
-    st.subheader("Characters: ")
-    st.write(entities["characters"])
-
-    st.subheader("Protagonist: ")
-    st.write(entities["protagonist"])
-
-    st.subheader("Character Traits: ")
-    for char, traits in entities["character_traits"].items():
-        st.write(f"{char}: {', '.join(traits)}")
-
-    st.subheader("Character Relationships: ")
-    for (char1, char2), relationship in entities["relationships"].items():
-        st.write(f"{char1} and {char2}: {relationship}")
+    abstractive_placeholder = st.empty()
+    category_placeholder = st.empty()
+    sentiment_placeholder = st.empty()
+    entities_placeholder = st.empty()
+    for placeholder in (extractive_placeholder, abstractive_placeholder):
+        placeholder.info("Summarizing...")
+    category_placeholder.info("Classifying...")
+    sentiment_placeholder.info("Analyzing sentiment...")
+    entities_placeholder.info("Extracting named entities...")
+
+    # Every run is traced for the timing breakdown; ?profile=1 in the URL also profiles it
+    profile = True if st.query_params.get('profile') == '1' else None
+    with trace('article', profile=profile) as article_trace:
+        for result in get_article_pipeline().run(st.session_state.selected_article_content):
+            if not result.ok:
+                placeholder = {
+                    'extractive': extractive_placeholder,
+                    'abstractive': abstractive_placeholder,
+                    'classification': category_placeholder,
+                    'category_sentiment': category_placeholder,
+                    'sentiment': sentiment_placeholder,
+                    'ner': entities_placeholder,
+                }[result.name]
+                placeholder.error(f"{result.name} failed: {result.error}")
+
+            # Step 4: Summaries
+            elif result.name == 'extractive':
+                extractive_placeholder.write(result.value)
+            elif result.name == 'abstractive':
+                abstractive_placeholder.write(result.value)
+
+            # Step 5: Perform Classification
+            elif result.name == 'classification':
+                category_placeholder.write(f"Predicted Category: **{result.value}**")
+
+            # Step 6: Sentiment Analysis
+            elif result.name == 'sentiment':
+                sentiment_placeholder.write(f"Sentiment Analysis: **{result.value}**")
+
+            # Step 7: Named Entity Recognition (NER)
+            elif result.name == 'ner':
+                entities = result.value
+                with entities_placeholder.container():
+                    st.subheader("Named Entities Extracted:")
+                    st.subheader("Characters: ")
+                    st.write(entities["characters"])
+
+                    st.subheader("Protagonist: ")
+                    st.write(entities["protagonist"])
+
+                    st.subheader("Character Traits: ")
+                    for char, traits in entities["character_traits"].items():
+                        st.write(f"{char}: {', '.join(traits)}")
+
+                    st.subheader("Character Relationships: ")
+                    for (char1, char2), relationship in entities["relationships"].items():
+                        st.write(f"{char1} and {char2}: {relationship}")
+
+    # Per-article timing breakdown: every stage and sub-step (tokenize, forward, generate, parse)
+    with st.expander(f"Timing breakdown ({article_trace.seconds:.2f}s)"):
+        st.table([
+            {
+                'step': '\u2003' * span['depth'] + span['name'],
+                'details': ', '.join(f"{key}={value}" for key, value in span['labels'].items()),
+                'start (ms)': round(span['start'] * 1000, 1),
+                'duration (ms)': round(span['seconds'] * 1000, 1),
+                'error': span['error'] or '',
+            }
+            for span in article_trace.breakdown()
+        ])
+        if article_trace.profile_path:
+            st.write(f"Profile written to `{article_trace.profile_path}`")
@@ -1,7 +1,30 @@
 # app/__init__.py
+import importlib
 
-from .data_collection import fetch_news, preprocess_news_data
-from .category_classification import classify_news
-from .sentiment_analysis import sentiment_analysis
-from .ner_extraction import analyze_story
-from .summarization import summarize_article
\ No newline at end of file
+# Public API, imported from its submodule on first access so that importing `app`
+# does not pull in torch, transformers, spaCy or Stanza
+_EXPORTS = {
+    'fetch_news': 'data_collection',
+    'fetch_article_content': 'data_collection',
+    'fetch_articles_content': 'data_collection',
+    'classify_news': 'category_classification',
+    'classify_news_batch': 'category_classification',
+    'sentiment_analysis': 'sentiment_analysis',
+    'sentiment_analysis_batch': 'sentiment_analysis',
+    'analyze_story': 'ner_extraction',
+    'analyze_stories': 'ner_extraction',
+    'summarize_article': 'summarization',
+    'registry': 'model_registry',
+    'get_model': 'model_registry',
+    'warm_models': 'model_registry',
+    'get_result_cache': 'result_cache',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        module = importlib.import_module(f'.{_EXPORTS[name]}', __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
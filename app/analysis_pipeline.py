@@ -0,0 +1,269 @@
+# app/analysis_pipeline.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .inference_server import get_inference_client
+from .instrumentation import span, run_in_context
+
+
+class Stage:
+    """
+    One step of the per-article analysis.
+
+    Parameters:
+    - name: Name the stage's result is published under.
+    - func: Callable receiving the values of `inputs` as positional arguments.
+    - inputs: Names of the values it consumes ('text' or another stage's name).
+    - timeout: Seconds after submission before the stage is reported as timed out.
+    """
+
+    def __init__(self, name, func, inputs=('text',), timeout=None):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.timeout = timeout
+
+
+class StageResult:
+    def __init__(self, name, value=None, error=None, seconds=None):
+        self.name = name
+        self.value = value
+        self.error = error
+        self.seconds = seconds
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        status = 'ok' if self.ok else f'error={self.error!r}'
+        return f"StageResult({self.name!r}, {status})"
+
+
+def _validate_stages(stages):
+    """
+    Raises ValueError unless the stages form a DAG: unique names, every input
+    'text' or another stage, and no stage depending on itself directly or
+    through a cycle.
+    """
+    names = [stage.name for stage in stages]
+    duplicates = sorted({name for name in names if names.count(name) > 1 or name == 'text'})
+    if duplicates:
+        raise ValueError(f"Stage names must be unique and not 'text': {duplicates}")
+    for stage in stages:
+        unknown = [name for name in stage.inputs if name != 'text' and name not in names]
+        if unknown:
+            raise ValueError(f"Stage '{stage.name}' depends on unknown stages: {unknown}")
+
+    # Topological sort (Kahn): stages never reached are on or behind a cycle
+    pending = {stage.name: {name for name in stage.inputs if name != 'text'} for stage in stages}
+    ready = [name for name, inputs in pending.items() if not inputs]
+    while ready:
+        done = ready.pop()
+        del pending[done]
+        for name, inputs in pending.items():
+            if done in inputs:
+                inputs.discard(done)
+                if not inputs:
+                    ready.append(name)
+    if pending:
+        raise ValueError(f"Stage dependencies form a cycle: {sorted(pending)}")
+
+
+class AnalysisPipeline:
+    """
+    Runs a DAG of analysis stages concurrently on a thread pool.
+
+    Stages start as soon as all their inputs are available, so independent
+    stages (extractive summary, BART generation, NER on the raw text) overlap
+    and the wall-clock time approaches the longest dependency chain. Results
+    are yielded as each stage finishes.
+    """
+
+    def __init__(self, stages, max_workers=4):
+        _validate_stages(stages)
+        self.stages = list(stages)
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='analysis')
+            return self._executor
+
+    def run(self, text, cancel_event=None):
+        """
+        Runs all stages on `text`, yielding a StageResult as each one completes.
+
+        Parameters:
+        - text: Article text.
+        - cancel_event: Optional threading.Event; once set, stages not yet started
+          are skipped and the remaining results are reported as cancelled.
+          Stages already running finish in the background.
+
+        Yields:
+        - StageResult for every stage. Failed, timed out and cancelled stages carry
+          an error, and stages depending on them are reported as skipped.
+        """
+        executor = self._get_executor()
+        values = {'text': text}
+        failed = set()
+        remaining = list(self.stages)
+        running = {}
+
+        def timed(stage, args):
+            start = time.perf_counter()
+            with span('stage', stage=stage.name):
+                value = stage.func(*args)
+            return value, time.perf_counter() - start
+
+        while remaining or running:
+            if cancel_event is not None and cancel_event.is_set():
+                for future, (stage, _) in running.items():
+                    future.cancel()
+                    yield StageResult(stage.name, error='cancelled')
+                for stage in remaining:
+                    yield StageResult(stage.name, error='cancelled')
+                return
+
+            # Start every stage whose inputs are ready; skip those whose inputs failed
+            for stage in list(remaining):
+                if any(name in failed for name in stage.inputs):
+                    remaining.remove(stage)
+                    failed.add(stage.name)
+                    yield StageResult(stage.name, error='skipped: an input stage failed')
+                elif all(name in values for name in stage.inputs):
+                    remaining.remove(stage)
+                    deadline = time.monotonic() + stage.timeout if stage.timeout else None
+                    args = [values[name] for name in stage.inputs]
+                    # Stage threads inherit the caller's context, so their spans join its trace
+                    running[executor.submit(run_in_context(timed, stage, args))] = (stage, deadline)
+
+            if not running:
+                # Nothing can start and nothing will finish: fail what is left instead of spinning
+                for stage in remaining:
+                    yield StageResult(stage.name, error='skipped: inputs can never become available')
+                return
+
+            deadlines = [deadline for _, deadline in running.values() if deadline is not None]
+            wait_timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+            if cancel_event is not None:
+                # Wake up regularly to notice cancellation
+                wait_timeout = 0.1 if wait_timeout is None else min(wait_timeout, 0.1)
+            done, _ = wait(list(running), timeout=wait_timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                stage, _ = running.pop(future)
+                try:
+                    value, seconds = future.result()
+                except Exception as e:
+                    failed.add(stage.name)
+                    yield StageResult(stage.name, error=f"{type(e).__name__}: {e}")
+                else:
+                    values[stage.name] = value
+                    yield StageResult(stage.name, value=value, seconds=seconds)
+
+            now = time.monotonic()
+            for future, (stage, deadline) in list(running.items()):
+                if deadline is not None and now >= deadline:
+                    # A running thread cannot be interrupted; its result is discarded
+                    future.cancel()
+                    running.pop(future)
+                    failed.add(stage.name)
+                    yield StageResult(stage.name, error=f'timed out after {stage.timeout}s')
+
+    def run_all(self, text, cancel_event=None):
+        """Runs all stages and returns a dictionary of stage name to StageResult."""
+        return {result.name: result for result in self.run(text, cancel_event)}
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+# Default per-article analysis, matching the Streamlit app. Model stages go through
+# the inference server when NEWS_INFERENCE_URL is set, and run in-process otherwise.
+def _extractive(text):
+    from .summarization import extractive_summarize
+    return extractive_summarize(text)
+
+def _abstractive(text):
+    client = get_inference_client()
+    if client is not None:
+        return client.summarize([text])[0]
+    from .summarization import abstractive_summarize_batch
+    return abstractive_summarize_batch([text])[0]
+
+def _classification(text):
+    client = get_inference_client()
+    if client is not None:
+        return client.classify([text])[0]['label']
+    from .category_classification import classify_news
+    return classify_news(text)
+
+def _sentiment(text):
+    client = get_inference_client()
+    if client is not None:
+        result = client.sentiment([text])[0]
+        return f"{result['label']} (Confidence: {result['score']:.2f})"
+    from .sentiment_analysis import sentiment_analysis
+    return sentiment_analysis(text)
+
+def _category_sentiment(text):
+    from .multitask import classify_and_analyze_sentiment_batch
+    return classify_and_analyze_sentiment_batch([text])[0]
+
+def _category_from_shared(result):
+    return result['category']['label']
+
+def _sentiment_from_shared(result):
+    return f"{result['sentiment']['label']} (Confidence: {result['sentiment']['score']:.2f})"
+
+def _ner(text):
+    from .ner_extraction import analyze_story
+    return analyze_story(text)
+
+
+def build_article_pipeline(ner_input='abstractive', timeouts=None, max_workers=4, multitask=None):
+    """
+    Builds the standard article DAG.
+
+    Extractive and abstractive summaries run on the raw text; classification and
+    sentiment run on the abstractive summary. NER runs on the abstractive summary
+    by default, or on the raw text with ner_input='text' so it overlaps with BART.
+
+    Parameters:
+    - ner_input: 'abstractive' or 'text'.
+    - timeouts: Optional dictionary of stage name to timeout in seconds.
+    - max_workers: Threads available to stages.
+    - multitask: Get category and sentiment from one encode of the shared model
+      (an extra 'category_sentiment' stage); None follows NEWS_MULTITASK unless
+      an inference server is configured.
+    """
+    from .backends import MULTITASK_ENABLED
+
+    if multitask is None:
+        multitask = MULTITASK_ENABLED and get_inference_client() is None
+    timeouts = timeouts or {}
+    stages = [
+        Stage('extractive', _extractive, ('text',), timeouts.get('extractive')),
+        Stage('abstractive', _abstractive, ('text',), timeouts.get('abstractive')),
+    ]
+    if multitask:
+        stages += [
+            Stage('category_sentiment', _category_sentiment, ('abstractive',), timeouts.get('category_sentiment')),
+            Stage('classification', _category_from_shared, ('category_sentiment',)),
+            Stage('sentiment', _sentiment_from_shared, ('category_sentiment',)),
+        ]
+    else:
+        stages += [
+            Stage('classification', _classification, ('abstractive',), timeouts.get('classification')),
+            Stage('sentiment', _sentiment, ('abstractive',), timeouts.get('sentiment')),
+        ]
+    stages.append(Stage('ner', _ner, (ner_input,), timeouts.get('ner')))
+    return AnalysisPipeline(stages, max_workers=max_workers)
@@ -0,0 +1,93 @@
+# app/backends.py
+import os
+import threading
+
+from .model_registry import artifact_version, register_model
+
+# Inference backends for the transformer stages:
+# - torch: the fp32 PyTorch model
+# - int8: PyTorch with dynamic int8 quantization of all Linear layers (applied at load time)
+# - onnx: ONNX Runtime model exported with `python -m app.optimization export`
+# - onnx-int8: dynamically quantized ONNX Runtime model
+BACKENDS = ('torch', 'int8', 'onnx', 'onnx-int8')
+
+# Registry name of the fp32 model behind each stage
+STAGE_MODELS = {
+    'classification': 'category_classifier',
+    'sentiment': 'sentiment',
+    'summarization': 'summarizer',
+}
+
+ONNX_DIR = os.path.join('models', 'onnx')
+
+# Serve classification and sentiment from the shared-encoder model (see multitask.py)
+MULTITASK_ENABLED = os.environ.get('NEWS_MULTITASK', '0') == '1'
+
+_backends = {
+    stage: os.environ.get(f'NEWS_BACKEND_{stage.upper()}', 'torch') for stage in STAGE_MODELS
+}
+_lock = threading.Lock()
+
+
+def onnx_model_dir(stage, quantized=False):
+    return os.path.join(ONNX_DIR, f'{stage}-int8' if quantized else stage)
+
+
+def set_backend(stage, backend):
+    """Select the inference backend of a stage (e.g. set_backend('classification', 'onnx'))."""
+    if stage not in STAGE_MODELS:
+        raise ValueError(f"Unknown stage '{stage}', expected one of {list(STAGE_MODELS)}")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {list(BACKENDS)}")
+    with _lock:
+        _backends[stage] = backend
+
+
+def get_backend(stage):
+    return _backends[stage]
+
+
+def stage_model_name(stage):
+    """Registry name of the model a stage currently runs on."""
+    base = STAGE_MODELS[stage]
+    backend = _backends[stage]
+    return base if backend == 'torch' else f'{base}:{backend}'
+
+
+def quantize_dynamic_int8(model):
+    import torch
+
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _replace_model(loaded, transform):
+    """Apply `transform` to the model inside a (tokenizer, model) tuple or a pipeline."""
+    if isinstance(loaded, tuple):
+        tokenizer, model = loaded
+        return tokenizer, transform(model)
+    loaded.model = transform(loaded.model)
+    return loaded
+
+
+def register_backend_variants(stage, load_torch, version, load_onnx):
+    """
+    Register the optimized variants of a stage's model next to the fp32 one.
+
+    Parameters:
+    - stage: Stage name from STAGE_MODELS.
+    - load_torch: Loader of the fp32 model (same object shape as the registered one).
+    - version: Version of the fp32 weights (a string or a callable, see artifact_version).
+    - load_onnx: Callable(model_dir, file_name) loading an exported ONNX model
+      into the same object shape.
+
+    ONNX variants are versioned by their exported files, so re-exporting
+    invalidates their cached results.
+    """
+    base = STAGE_MODELS[stage]
+    fp32_version = version if callable(version) else (lambda: version)
+    register_model(f'{base}:int8', lambda: _replace_model(load_torch(), quantize_dynamic_int8),
+                   version=lambda: f'{fp32_version()}:int8')
+    register_model(f'{base}:onnx', lambda: load_onnx(onnx_model_dir(stage), None),
+                   version=artifact_version(onnx_model_dir(stage)))
+    register_model(f'{base}:onnx-int8', lambda: load_onnx(onnx_model_dir(stage, quantized=True), 'model_quantized.onnx'),
+                   version=artifact_version(onnx_model_dir(stage, quantized=True)))
@@ -0,0 +1,342 @@
+# app/batch_pipeline.py
+"""
+Offline batch pipeline: summarization, classification, sentiment and NER over
+large article archives.
+
+Usage:
+    python -m app.batch_pipeline articles.jsonl results.jsonl --workers 4 --chunk-size 32
+
+Input is streamed from JSONL, CSV or Parquet; results are appended to a JSONL
+file as chunks complete, and a checkpoint file next to the output lets a
+crashed run resume where it stopped.
+"""
+import argparse
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+STAGES = ('summarization', 'classification', 'sentiment', 'ner')
+
+
+# Streaming readers
+def _read_jsonl(path):
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def _read_csv(path, chunksize=1000):
+    import pandas as pd
+
+    for frame in pd.read_csv(path, chunksize=chunksize):
+        yield from frame.to_dict(orient='records')
+
+def _read_parquet(path, batch_size=1000):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Reading Parquet input requires pyarrow: pip install pyarrow")
+
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+        yield from batch.to_pylist()
+
+def read_articles(path, text_field='content', id_field='id'):
+    """
+    Streams (id, text) pairs from a JSONL, CSV or Parquet file without loading it whole.
+
+    Records without an id field are numbered by their position in the file.
+    Missing texts (None, or NaN from CSV/Parquet) are returned as ''.
+    """
+    import pandas as pd
+
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.jsonl', '.json'):
+        records = _read_jsonl(path)
+    elif extension == '.csv':
+        records = _read_csv(path)
+    elif extension == '.parquet':
+        records = _read_parquet(path)
+    else:
+        raise ValueError(f"Unsupported input format: {extension}")
+
+    for position, record in enumerate(records):
+        text = record.get(text_field)
+        missing = text is None or (pd.api.types.is_scalar(text) and pd.isna(text))
+        yield record.get(id_field, position), '' if missing else str(text)
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# Worker side: each process loads its models once through the shared registry
+def _warm_worker(models):
+    from .model_registry import warm_models
+
+    warm_models(models, background=False)
+
+def process_chunk(chunk):
+    """
+    Runs every stage over one chunk of (id, text) pairs.
+
+    Articles without text skip every stage and get empty results.
+
+    Returns:
+    - (results, stage_seconds) where results are JSON-serialisable dictionaries.
+    """
+    from .summarization import extractive_summarize_many, abstractive_summarize_batch
+    from .category_classification import classify_news_batch
+    from .sentiment_analysis import sentiment_analysis_batch
+    from .ner_extraction import analyze_stories
+    from .inference_server import get_inference_client
+    from .instrumentation import span
+    from .backends import MULTITASK_ENABLED
+
+    # With NEWS_INFERENCE_URL set, the transformer stages are served by the shared inference server
+    client = get_inference_client()
+    if client is not None:
+        abstractive_summarize_batch = client.summarize
+        classify_news_batch = client.classify
+        sentiment_analysis_batch = client.sentiment
+
+    texts = [text for _, text in chunk if text.strip()]
+    seconds = dict.fromkeys(STAGES, 0.0)
+    if not texts:
+        return [_empty_result(article_id) for article_id, _ in chunk], seconds
+
+    start = time.perf_counter()
+    with span('stage', stage='summarization'):
+        extractive = extractive_summarize_many(texts)
+        abstractive = abstractive_summarize_batch(texts)
+    seconds['summarization'] = time.perf_counter() - start
+
+    if MULTITASK_ENABLED and client is None:
+        from .multitask import classify_and_analyze_sentiment_batch
+
+        # One encode gives both labels; the shared time is reported under classification
+        start = time.perf_counter()
+        with span('stage', stage='category_sentiment'):
+            shared = classify_and_analyze_sentiment_batch(abstractive)
+        categories = [result['category'] for result in shared]
+        sentiments = [result['sentiment'] for result in shared]
+        seconds['classification'] = time.perf_counter() - start
+        seconds['sentiment'] = 0.0
+    else:
+        start = time.perf_counter()
+        with span('stage', stage='classification'):
+            categories = classify_news_batch(abstractive)
+        seconds['classification'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with span('stage', stage='sentiment'):
+            sentiments = sentiment_analysis_batch(abstractive)
+        seconds['sentiment'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with span('stage', stage='ner'):
+        stories = analyze_stories(abstractive)
+    seconds['ner'] = time.perf_counter() - start
+
+    results = []
+    i = -1
+    for article_id, text in chunk:
+        if not text.strip():
+            results.append(_empty_result(article_id))
+            continue
+        i += 1
+        story = stories[i]
+        results.append({
+            'id': article_id,
+            'extractive': extractive[i],
+            'abstractive': abstractive[i],
+            'category': categories[i],
+            'sentiment': sentiments[i],
+            'characters': story['characters'],
+            'protagonist': story['protagonist'],
+            'character_traits': story['character_traits'],
+            # Tuple keys are not valid JSON
+            'relationships': [
+                {'characters': list(pair), 'relationship': relationship}
+                for pair, relationship in story['relationships'].items()
+            ],
+        })
+    return results, seconds
+
+def _empty_result(article_id):
+    return {
+        'id': article_id,
+        'extractive': '',
+        'abstractive': '',
+        'category': None,
+        'sentiment': None,
+        'characters': [],
+        'protagonist': None,
+        'character_traits': {},
+        'relationships': [],
+    }
+
+
+# Checkpointing
+def _checkpoint_path(output_path):
+    return output_path + '.checkpoint'
+
+def load_checkpoint(output_path):
+    """Returns (records_done, output_bytes) of the last completed chunk, or (0, 0)."""
+    try:
+        with open(_checkpoint_path(output_path)) as f:
+            state = json.load(f)
+        return state['records_done'], state['output_bytes']
+    except (OSError, ValueError, KeyError):
+        return 0, 0
+
+def save_checkpoint(output_path, records_done, output_bytes):
+    tmp_path = _checkpoint_path(output_path) + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'records_done': records_done, 'output_bytes': output_bytes}, f)
+    os.replace(tmp_path, _checkpoint_path(output_path))
+
+
+def _prepare_output(output_path, resume, overwrite):
+    """
+    Returns (records_done, output_bytes) to continue from, refusing to discard
+    existing results unless `overwrite` is set.
+    """
+    output_size = os.path.getsize(output_path) if os.path.exists(output_path) else 0
+    if resume and os.path.exists(_checkpoint_path(output_path)):
+        records_done, output_bytes = load_checkpoint(output_path)
+        if output_bytes > output_size:
+            raise ValueError(f"Checkpoint of {output_path} covers {output_bytes} bytes but the file has "
+                             f"{output_size}; use overwrite to start over")
+        return records_done, output_bytes
+
+    if output_size and not overwrite:
+        raise FileExistsError(f"{output_path} already holds results that are not being resumed; "
+                              f"use overwrite to replace them")
+    # Reset before truncating, so a crash before the first chunk cannot leave a checkpoint past the end of the file
+    save_checkpoint(output_path, 0, 0)
+    return 0, 0
+
+def run_batch(input_path, output_path, workers=1, chunk_size=32, text_field='content', id_field='id',
+              resume=True, max_pending=None, overwrite=False):
+    """
+    Runs the full pipeline over an article file.
+
+    Parameters:
+    - input_path: JSONL, CSV or Parquet file of articles.
+    - output_path: JSONL file results are appended to.
+    - workers: Number of worker processes (models are loaded once per worker).
+    - chunk_size: Articles per chunk; each stage runs batched over a chunk.
+    - text_field, id_field: Input column names.
+    - resume: Continue from the checkpoint next to the output file if present.
+    - overwrite: Allow replacing an output file that is not resumed (with resume=False,
+      or without a checkpoint). Otherwise such a file raises FileExistsError.
+    - max_pending: Maximum chunks in flight (defaults to 2 per worker), which bounds memory.
+
+    Returns:
+    - Dictionary with the processed article count and per-stage throughput (articles/sec).
+    """
+    records_done, output_bytes = _prepare_output(output_path, resume, overwrite)
+    if records_done:
+        print(f"Resuming after {records_done} articles")
+
+    # Drop any partially written output from a crashed run
+    with open(output_path, 'ab') as out:
+        out.truncate(output_bytes)
+
+    articles = islice(read_articles(input_path, text_field, id_field), records_done, None)
+    chunks = _chunks(articles, chunk_size)
+    max_pending = max_pending or 2 * workers
+
+    stage_seconds = dict.fromkeys(STAGES, 0.0)
+    processed = 0
+    started = time.perf_counter()
+
+    from .backends import stage_model_name, MULTITASK_ENABLED
+
+    # Warm exactly the models the workers will run: the configured backend
+    # variants, and only the spaCy pipelines when transformer stages are served remotely
+    models = ['sentencizer', 'spacy_lg']
+    if not os.environ.get('NEWS_INFERENCE_URL'):
+        models.append(stage_model_name('summarization'))
+        if MULTITASK_ENABLED:
+            # One shared encoder replaces the separate classifier and sentiment models
+            models.append('multitask')
+        else:
+            models += [stage_model_name(stage) for stage in ('classification', 'sentiment')]
+    if os.environ.get('NEWS_NER_COREF', '1') == '1':
+        models.append('stanza')
+    with ProcessPoolExecutor(max_workers=workers, initializer=_warm_worker, initargs=(models,)) as executor, \
+            open(output_path, 'a', encoding='utf-8') as out:
+        pending = deque()
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < max_pending:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    exhausted = True
+                else:
+                    pending.append((len(chunk), executor.submit(process_chunk, chunk)))
+            if not pending:
+                break
+
+            # Results are written in input order so the checkpoint is a simple record count
+            count, future = pending.popleft()
+            results, seconds = future.result()
+            for result in results:
+                out.write(json.dumps(result, ensure_ascii=False) + '\n')
+            out.flush()
+            os.fsync(out.fileno())
+
+            records_done += count
+            processed += count
+            save_checkpoint(output_path, records_done, out.tell())
+            for stage, value in seconds.items():
+                stage_seconds[stage] += value
+
+            elapsed = time.perf_counter() - started
+            print(f"{records_done} articles done ({processed / elapsed:.2f} articles/sec)")
+
+    throughput = {
+        stage: (processed / value if value else None) for stage, value in stage_seconds.items()
+    }
+    elapsed = time.perf_counter() - started
+    return {
+        'articles': processed,
+        'seconds': elapsed,
+        'articles_per_sec': processed / elapsed if elapsed else None,
+        # Per-stage rates are per worker process; the overall rate includes parallelism
+        'stage_articles_per_sec': throughput,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input')
+    parser.add_argument('output')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--chunk-size', type=int, default=32)
+    parser.add_argument('--text-field', default='content')
+    parser.add_argument('--id-field', default='id')
+    parser.add_argument('--no-resume', action='store_true', help='Ignore an existing checkpoint')
+    parser.add_argument('--overwrite', action='store_true', help='Replace existing results that are not resumed')
+    args = parser.parse_args()
+
+    report = run_batch(args.input, args.output, workers=args.workers, chunk_size=args.chunk_size,
+                       text_field=args.text_field, id_field=args.id_field, resume=not args.no_resume,
+                       overwrite=args.overwrite)
+    print(f"Processed {report['articles']} articles in {report['seconds']:.1f}s "
+          f"({report['articles_per_sec'] or 0:.2f} articles/sec)")
+    for stage, rate in report['stage_articles_per_sec'].items():
+        print(f"  {stage}: {rate or 0:.2f} articles/sec per worker")
+
+
+if __name__ == "__main__":
+    main()
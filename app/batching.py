@@ -0,0 +1,76 @@
+# app/batching.py
+from .instrumentation import span, increment, observe
+
+
+def length_bucketed_batches(lengths, batch_size):
+    """
+    Group item indices into batches of similar length.
+
+    Items are sorted by length so each batch only needs padding up to its own
+    longest member.
+
+    Parameters:
+    - lengths: Sequence of token counts, one per item.
+    - batch_size: Maximum number of items per batch.
+
+    Returns:
+    - List of index lists, one per batch.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+
+def batched_class_probabilities(tokenizer, model, texts, batch_size=16, max_length=512, name='classifier'):
+    """
+    Run a sequence classification model over many texts with dynamic padding.
+
+    Parameters:
+    - tokenizer: Hugging Face tokenizer matching the model.
+    - model: Sequence classification model in eval mode.
+    - texts: List of input strings.
+    - batch_size: Maximum number of texts per forward pass.
+    - max_length: Truncation length in tokens.
+    - name: Model label attached to the timing spans and token counters.
+
+    Returns:
+    - List of probability lists, in the same order as `texts`.
+    """
+    return batched_head_probabilities(tokenizer, model, texts, ('logits',), batch_size, max_length, name)['logits']
+
+
+def batched_head_probabilities(tokenizer, model, texts, heads, batch_size=16, max_length=512, name='classifier'):
+    """
+    Like batched_class_probabilities for models with several classification heads.
+
+    Every text is encoded once; `heads` names the logits attributes of the
+    model output to turn into probabilities (e.g. ('category_logits', 'sentiment_logits')).
+
+    Returns:
+    - Dictionary mapping each head to a list of probability lists, in the same order as `texts`.
+    """
+    if not texts:
+        return {head: [] for head in heads}
+
+    import torch
+
+    with span('tokenize', model=name):
+        encodings = tokenizer([str(text) for text in texts], max_length=max_length, truncation=True)
+    input_ids = encodings['input_ids']
+    lengths = [len(ids) for ids in input_ids]
+    increment('tokens', sum(lengths), model=name)
+
+    probabilities = {head: [None] * len(texts) for head in heads}
+    with torch.no_grad():
+        for batch_indices in length_bucketed_batches(lengths, batch_size):
+            features = [{key: encodings[key][i] for key in encodings.keys()} for i in batch_indices]
+            # Pad only to the longest member of this batch
+            batch = tokenizer.pad(features, padding='longest', return_tensors='pt')
+            observe('batch_size', len(batch_indices), model=name)
+            increment('padded_tokens', batch['input_ids'].numel(), model=name)
+            with span('forward', model=name):
+                outputs = model(**batch)
+            for head in heads:
+                batch_probs = torch.softmax(getattr(outputs, head), dim=-1).tolist()
+                for i, probs in zip(batch_indices, batch_probs):
+                    probabilities[head][i] = probs
+    return probabilities
@@ -0,0 +1,189 @@
+# app/cascade.py
+"""
+Cheap-first cascade classifier: a TF-IDF + logistic regression model answers
+when it is confident, and only uncertain texts are escalated to RoBERTa.
+
+Usage:
+    python -m app.cascade train                      # fit the linear model and calibrate its threshold
+    python -m app.cascade evaluate --thresholds 0.8 0.9 0.95
+"""
+import argparse
+import os
+import time
+
+import joblib
+import numpy as np
+
+from .model_registry import artifact_version, register_model, get_model
+from .result_cache import cached_batch_stage, result_cache_disabled
+from .backends import stage_model_name
+
+LINEAR_MODEL_PATH = os.path.join('models', 'linear_model.joblib')
+# Accuracy the linear model must reach on the items it answers during calibration
+DEFAULT_TARGET_ACCURACY = 0.95
+
+register_model('linear_classifier', lambda: joblib.load(LINEAR_MODEL_PATH), version=artifact_version(LINEAR_MODEL_PATH))
+
+
+def calibrate_threshold(confidences, correct, target_accuracy=DEFAULT_TARGET_ACCURACY):
+    """
+    Lowest confidence threshold at which the accepted items reach `target_accuracy`.
+
+    Items are accepted when their confidence is at or above the threshold; a
+    lower threshold means fewer escalations to RoBERTa.
+    """
+    order = np.argsort(-confidences, kind='stable')
+    accepted_accuracy = np.cumsum(correct[order]) / np.arange(1, len(order) + 1)
+    meets_target = np.nonzero(accepted_accuracy >= target_accuracy)[0]
+    if len(meets_target) == 0:
+        return 1.0
+    return float(confidences[order][meets_target[-1]])
+
+
+def train_linear_classifier(train_df, target_accuracy=DEFAULT_TARGET_ACCURACY, calibration_fraction=0.1):
+    """
+    Fits the TF-IDF + logistic regression model and calibrates its escalation threshold.
+
+    Parameters:
+    - train_df: DataFrame with 'description' and 'class_id' columns (as from load_data).
+    - target_accuracy: Accuracy required on the items the linear model answers.
+    - calibration_fraction: Share of train_df held out to calibrate the threshold.
+    """
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import make_pipeline
+
+    calibration_df = train_df.sample(frac=calibration_fraction, random_state=42)
+    fit_df = train_df.drop(calibration_df.index)
+
+    pipeline = make_pipeline(
+        TfidfVectorizer(sublinear_tf=True, ngram_range=(1, 2), min_df=2, max_features=200000),
+        LogisticRegression(max_iter=1000),
+    )
+    pipeline.fit(fit_df['description'].astype(str), fit_df['class_id'])
+
+    probabilities = pipeline.predict_proba(calibration_df['description'].astype(str))
+    predictions = pipeline.classes_[probabilities.argmax(axis=1)]
+    correct = (predictions == calibration_df['class_id'].to_numpy()).astype(float)
+    threshold = calibrate_threshold(probabilities.max(axis=1), correct, target_accuracy)
+    print(f"Linear model calibration accuracy: {correct.mean():.3f}, threshold: {threshold:.3f}")
+
+    os.makedirs(os.path.dirname(LINEAR_MODEL_PATH), exist_ok=True)
+    joblib.dump({'pipeline': pipeline, 'threshold': threshold}, LINEAR_MODEL_PATH)
+    return pipeline, threshold
+
+
+@cached_batch_stage('classification_cascade',
+                    models=('linear_classifier', lambda: stage_model_name('classification')),
+                    ignore=('batch_size',))
+def classify_news_cascade_batch(texts, threshold=None, batch_size=16):
+    """
+    Classifies texts with the linear model, escalating low-confidence ones to RoBERTa.
+
+    Parameters:
+    - texts: List of texts to classify.
+    - threshold: Confidence needed to answer without RoBERTa (defaults to the calibrated one).
+    - batch_size: Maximum number of escalated texts per RoBERTa forward pass.
+
+    Returns:
+    - List of dictionaries with 'label', 'score', 'probabilities' and 'model'
+      ('linear' or 'roberta'), in the same order as `texts`.
+    """
+    from .category_classification import LABEL_MAP, classify_news_batch
+
+    linear = get_model('linear_classifier')
+    pipeline = linear['pipeline']
+    threshold = linear['threshold'] if threshold is None else threshold
+
+    probabilities = pipeline.predict_proba([str(text) for text in texts])
+    results = [None] * len(texts)
+    escalated = []
+    for i, probs in enumerate(probabilities):
+        best = int(probs.argmax())
+        if probs[best] >= threshold:
+            results[i] = {
+                'label': LABEL_MAP[int(pipeline.classes_[best])],
+                'score': float(probs[best]),
+                'probabilities': {LABEL_MAP[int(c)]: float(p) for c, p in zip(pipeline.classes_, probs)},
+                'model': 'linear',
+            }
+        else:
+            escalated.append(i)
+
+    if escalated:
+        for i, result in zip(escalated, classify_news_batch([texts[i] for i in escalated], batch_size=batch_size)):
+            results[i] = dict(result, model='roberta')
+    return results
+
+
+# Measure real inference, never cached results
+@result_cache_disabled()
+def evaluate_cascade(thresholds=None, limit=None, batch_size=16):
+    """
+    Compares the cascade with RoBERTa-only classification on models/test.csv.
+
+    Returns:
+    - Dictionary with a 'roberta' entry and one entry per threshold, each holding
+      accuracy, escalation rate and end-to-end latency (ms per text).
+    """
+    from .category_classification import LABEL_MAP, load_data, classify_news_batch
+
+    _, test_df = load_data()
+    if limit:
+        test_df = test_df.head(limit)
+    texts = test_df['description'].astype(str).tolist()
+    expected = [LABEL_MAP[c] for c in test_df['class_id']]
+
+    def accuracy(results):
+        return sum(r['label'] == e for r, e in zip(results, expected)) / len(expected)
+
+    get_model(stage_model_name('classification'))
+    linear = get_model('linear_classifier')
+
+    start = time.perf_counter()
+    roberta_results = classify_news_batch(texts, batch_size=batch_size)
+    roberta_seconds = time.perf_counter() - start
+    report = {'roberta': {
+        'accuracy': accuracy(roberta_results),
+        'escalation_rate': 1.0,
+        'ms_per_text': roberta_seconds * 1000 / len(texts),
+    }}
+
+    for threshold in thresholds or [linear['threshold']]:
+        start = time.perf_counter()
+        results = classify_news_cascade_batch(texts, threshold=threshold, batch_size=batch_size)
+        seconds = time.perf_counter() - start
+        report[threshold] = {
+            'accuracy': accuracy(results),
+            'escalation_rate': sum(r['model'] == 'roberta' for r in results) / len(results),
+            'ms_per_text': seconds * 1000 / len(texts),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    train_parser = commands.add_parser('train')
+    train_parser.add_argument('--full', action='store_true', help='Use the full training set')
+    train_parser.add_argument('--target-accuracy', type=float, default=DEFAULT_TARGET_ACCURACY)
+    evaluate_parser = commands.add_parser('evaluate')
+    evaluate_parser.add_argument('--thresholds', type=float, nargs='*')
+    evaluate_parser.add_argument('--limit', type=int)
+    args = parser.parse_args()
+
+    if args.command == 'train':
+        from .category_classification import load_data
+
+        train_df, _ = load_data(sample_size=None if args.full else 1000)
+        train_linear_classifier(train_df, target_accuracy=args.target_accuracy)
+        return
+
+    for name, entry in evaluate_cascade(args.thresholds, args.limit).items():
+        label = name if name == 'roberta' else f"threshold {name:.2f}"
+        print(f"{label:<16} accuracy {entry['accuracy']:.3f}  escalation {entry['escalation_rate']:.1%}  "
+              f"{entry['ms_per_text']:.2f} ms/text")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,56 @@
+import argparse
+import os
+import time
 import pandas as pd
 import torch
 from torch.utils.data import Dataset, DataLoader
-from transformers import RobertaTokenizer, RobertaForSequenceClassification, AdamW
-from huggingface_hub import login  # Import login function
-from sklearn.preprocessing import LabelEncoder
 import random
+from .model_registry import artifact_version, register_model, get_model
+from .batching import batched_class_probabilities
+from .result_cache import cached_batch_stage
+from .backends import register_backend_variants, stage_model_name
+from .training_data import (TOKENIZED_DIR, preprocess_dataset, TokenizedNewsDataset, LengthBucketSampler,
+                            DynamicPaddingCollator)
 
-# Set your Hugging Face token here
-HUGGINGFACE_TOKEN = 'YOUR_HUGGINGFACE_TOKEN'  # Replace with your actual token
+# Hugging Face token, only needed to download models when training
+HUGGINGFACE_TOKEN = os.environ.get('HUGGINGFACE_TOKEN')
 
 # Set a seed for reproducibility
 random.seed(42)
 
-# Log in to Hugging Face
-login(HUGGINGFACE_TOKEN)
+# Map the predicted class index back to a human-readable label
+LABEL_MAP = {0: 'World', 1: 'Sports', 2: 'Business', 3: 'Sci/Tech'}
+
+# Log in to Hugging Face (only when training, never at import time)
+def _login_to_hub():
+    if HUGGINGFACE_TOKEN:
+        from huggingface_hub import login
+        login(HUGGINGFACE_TOKEN)
+
+CLASSIFIER_MODEL_DIR = 'models/roberta_model'
+
+def _load_classifier():
+    from transformers import RobertaTokenizer, RobertaForSequenceClassification
+
+    tokenizer = RobertaTokenizer.from_pretrained(CLASSIFIER_MODEL_DIR)
+    model = RobertaForSequenceClassification.from_pretrained(CLASSIFIER_MODEL_DIR)
+    model.eval()
+    return tokenizer, model
+
+def _load_onnx_classifier(model_dir, file_name):
+    from transformers import RobertaTokenizer
+    from optimum.onnxruntime import ORTModelForSequenceClassification
+
+    tokenizer = RobertaTokenizer.from_pretrained(model_dir)
+    model = ORTModelForSequenceClassification.from_pretrained(model_dir, file_name=file_name)
+    return tokenizer, model
+
+register_model('category_classifier', _load_classifier, version=artifact_version(CLASSIFIER_MODEL_DIR))
+register_backend_variants('classification', _load_classifier, artifact_version(CLASSIFIER_MODEL_DIR),
+                          _load_onnx_classifier)
 
 # Load data from CSV
-def load_data():
+def load_data(sample_size=1000):
     train_df = pd.read_csv('models/train.csv')
     test_df = pd.read_csv('models/test.csv')
     
@@ -28,8 +62,9 @@ def load_data():
     train_df['class_id'] = train_df['class_id'] - 1
     test_df['class_id'] = test_df['class_id'] - 1
 
-    # Randomly sample 1000 examples from train_df
-    train_df = train_df.sample(n=1000, random_state=42)
+    # Randomly sample examples from train_df (None keeps the full training set)
+    if sample_size is not None:
+        train_df = train_df.sample(n=sample_size, random_state=42)
     
     return train_df, test_df
 
@@ -62,70 +97,161 @@ class NewsDataset(Dataset):
         return {key: value.squeeze(0) for key, value in inputs.items()}
 
 # Training function
-def train_classifier(train_df):
+def train_classifier(train_df, epochs=1, batch_size=8, grad_accum_steps=1, num_workers=2,
+                     learning_rate=5e-5, max_len=512, log_every=10, multitask=False,
+                     distill_weight=1.0, temperature=2.0):
+    """
+    Fine-tunes roberta-base on pre-tokenized, memory-mapped training data.
+
+    With multitask=True a shared-encoder model with category and sentiment heads
+    is trained instead (see multitask.py); its sentiment head learns from the
+    existing sentiment model's predictions on the same texts.
+
+    Parameters:
+    - train_df: DataFrame with 'description' and 'class_id' columns.
+    - epochs: Number of passes over the training data.
+    - batch_size: Examples per forward pass; batches group examples of similar length.
+    - grad_accum_steps: Forward passes per optimizer step (effective batch = batch_size * grad_accum_steps).
+    - num_workers: DataLoader worker processes.
+    - learning_rate: AdamW learning rate.
+    - max_len: Truncation length in tokens.
+    - log_every: Print loss and throughput every this many optimizer steps.
+    - multitask: Train the shared category + sentiment model.
+    - distill_weight: Weight of the sentiment distillation loss (multitask only).
+    - temperature: Distillation temperature (multitask only).
+    """
+    from transformers import RobertaTokenizer, RobertaForSequenceClassification
+
+    _login_to_hub()
     tokenizer = RobertaTokenizer.from_pretrained('roberta-base')
-    model = RobertaForSequenceClassification.from_pretrained('roberta-base', num_labels=4)
 
-    # Dataset and DataLoader
-    train_dataset = NewsDataset(train_df['description'].values, train_df['class_id'].values, tokenizer)
-    train_loader = DataLoader(train_dataset, batch_size=8, shuffle=True)
+    # Tokenize once into memory-mapped arrays, then batch by length with dynamic padding
+    prefix = preprocess_dataset(train_df, tokenizer, os.path.join(TOKENIZED_DIR, 'train'), max_len=max_len)
+    if multitask:
+        from .multitask import MULTITASK_MODEL_DIR, MultiTaskRoberta, sentiment_teacher_targets
+
+        model = MultiTaskRoberta.from_encoder('roberta-base', num_categories=len(LABEL_MAP),
+                                              distill_weight=distill_weight, temperature=temperature)
+        train_dataset = TokenizedNewsDataset(prefix, soft_targets=sentiment_teacher_targets(train_df, prefix))
+        output_dir = MULTITASK_MODEL_DIR
+    else:
+        model = RobertaForSequenceClassification.from_pretrained('roberta-base', num_labels=len(LABEL_MAP))
+        train_dataset = TokenizedNewsDataset(prefix)
+        output_dir = CLASSIFIER_MODEL_DIR
+    sampler = LengthBucketSampler(train_dataset.lengths(), batch_size)
+    train_loader = DataLoader(
+        train_dataset,
+        batch_sampler=sampler,
+        collate_fn=DynamicPaddingCollator(train_dataset.pad_token_id, soft_target_key='sentiment_targets'),
+        num_workers=num_workers,
+        persistent_workers=num_workers > 0,
+    )
 
     # Optimizer and loss
-    optimizer = AdamW(model.parameters(), lr=5e-5)
+    optimizer = torch.optim.AdamW(model.parameters(), lr=learning_rate, weight_decay=0.0)
 
     model.train()
+    steps_per_epoch = (len(train_loader) + grad_accum_steps - 1) // grad_accum_steps
 
     # Training loop for epochs
-    for epoch in range(1):
+    for epoch in range(epochs):
         print(f"Starting epoch {epoch+1}")
+        sampler.set_epoch(epoch)
         total_loss = 0
+        step = 0
+        examples_since_log = 0
+        log_start = time.perf_counter()
+        optimizer.zero_grad()
         for batch_idx, batch in enumerate(train_loader):
-            optimizer.zero_grad()
             outputs = model(**batch)
             loss = outputs.loss
             total_loss += loss.item()
-            loss.backward()
-            optimizer.step()
+            (loss / grad_accum_steps).backward()
+            examples_since_log += batch['labels'].size(0)
+
+            last_batch = batch_idx + 1 == len(train_loader)
+            if (batch_idx + 1) % grad_accum_steps == 0 or last_batch:
+                optimizer.step()
+                optimizer.zero_grad()
+                step += 1
 
-            # Print progress for every 10 batches
-            if batch_idx % 10 == 0:
-                print(f"Epoch: {epoch+1}, Batch: {batch_idx+1}/{len(train_loader)}, Loss: {loss.item()}")
+                # Print progress and throughput every few optimizer steps
+                if step % log_every == 0 or last_batch:
+                    elapsed = time.perf_counter() - log_start
+                    print(f"Epoch: {epoch+1}, Step: {step}/{steps_per_epoch}, Loss: {loss.item():.4f}, "
+                          f"Throughput: {examples_since_log / elapsed:.1f} examples/sec")
+                    examples_since_log = 0
+                    log_start = time.perf_counter()
         print(f"Epoch {epoch+1} completed. Average Loss: {total_loss/len(train_loader)}")
 
     # Save the trained model
-    model.save_pretrained('models/roberta_model')
-    tokenizer.save_pretrained('models/roberta_model')
+    os.makedirs(output_dir, exist_ok=True)
+    model.save_pretrained(output_dir)
+    tokenizer.save_pretrained(output_dir)
 
-# Classification function to use the saved model
-def classify_news(text):
-    # Load the saved model and tokenizer
-    tokenizer = RobertaTokenizer.from_pretrained('models/roberta_model')
-    model = RobertaForSequenceClassification.from_pretrained('models/roberta_model')
-    model.eval()
+# Batch classification with length bucketing and dynamic padding
+@cached_batch_stage('classification', models=(lambda: stage_model_name('classification'),), ignore=('batch_size',))
+def classify_news_batch(texts, batch_size=16, max_length=512):
+    """
+    Classifies many news texts with one forward pass per length-bucketed batch.
 
-    # Tokenize and encode the input text
-    inputs = tokenizer(
-        text,
-        max_length=512,
-        padding='max_length',
-        truncation=True,
-        return_tensors="pt"
-    )
+    Parameters:
+    - texts: List of texts to classify.
+    - batch_size: Maximum number of texts per forward pass.
+    - max_length: Truncation length in tokens.
 
-    # Perform the prediction
-    with torch.no_grad():
-        outputs = model(**inputs)
-        logits = outputs.logits
-        predicted_class = logits.argmax(dim=1).item()
+    Returns:
+    - List of dictionaries with 'label', 'score' and 'probabilities' (one per class),
+      in the same order as `texts`.
+    """
+    model_name = stage_model_name('classification')
+    tokenizer, model = get_model(model_name)
+    probabilities = batched_class_probabilities(tokenizer, model, texts, batch_size, max_length, name=model_name)
 
-    # Map the predicted class index back to a human-readable label
-    label_map = {0: 'World', 1: 'Sports', 2: 'Business', 3: 'Sci/Tech'}
-    return label_map[predicted_class]
+    results = []
+    for probs in probabilities:
+        predicted_class = max(range(len(probs)), key=probs.__getitem__)
+        results.append({
+            'label': LABEL_MAP[predicted_class],
+            'score': probs[predicted_class],
+            'probabilities': {LABEL_MAP[i]: p for i, p in enumerate(probs)},
+        })
+    return results
+
+# Answer confident texts with the TF-IDF model first (see cascade.py) when enabled
+CASCADE_ENABLED = os.environ.get('NEWS_CLASSIFIER_CASCADE', '0') == '1'
+
+# Classification function to use the saved model
+def classify_news(text):
+    if CASCADE_ENABLED:
+        from .cascade import classify_news_cascade_batch
+        return classify_news_cascade_batch([text])[0]['label']
+    return classify_news_batch([text])[0]['label']
 
 # Main function to load data and start training
 def main():
-    train_df, _ = load_data()
-    train_classifier(train_df)
+    parser = argparse.ArgumentParser(description="Fine-tune the RoBERTa news classifier")
+    parser.add_argument('--full', action='store_true', help='Train on the full training set instead of a 1000-row sample')
+    parser.add_argument('--epochs', type=int, default=1)
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--grad-accum-steps', type=int, default=1)
+    parser.add_argument('--num-workers', type=int, default=2)
+    parser.add_argument('--skip-linear', action='store_true', help='Do not train the cascade TF-IDF model')
+    parser.add_argument('--multitask', action='store_true',
+                        help='Train the shared category + sentiment model (sentiment distilled from the existing model)')
+    parser.add_argument('--distill-weight', type=float, default=1.0)
+    parser.add_argument('--temperature', type=float, default=2.0)
+    args = parser.parse_args()
+
+    train_df, _ = load_data(sample_size=None if args.full else 1000)
+    train_classifier(train_df, epochs=args.epochs, batch_size=args.batch_size,
+                     grad_accum_steps=args.grad_accum_steps, num_workers=args.num_workers,
+                     multitask=args.multitask, distill_weight=args.distill_weight, temperature=args.temperature)
+
+    # The cheap first stage of the cascade classifier is trained on the same data
+    if not args.skip_linear:
+        from .cascade import train_linear_classifier
+        train_linear_classifier(train_df)
 
 if __name__ == "__main__":
     main()
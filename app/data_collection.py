@@ -1,34 +1,259 @@
 import pandas as pd
 import http.client, urllib.parse
 import json
+import os
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from .http_cache import get_http_cache
+from .html_extraction import extract_article_text, charset_from_content_type, DEFAULT_MAX_BYTES
+from .instrumentation import span, increment
 
-def fetch_article_content(url):
+# (connect, read) timeout in seconds for article downloads
+DEFAULT_TIMEOUT = (5, 15)
+# Concurrent downloads allowed against any single host, across all callers in the process
+DEFAULT_PER_HOST_LIMIT = int(os.environ.get('NEWS_PER_HOST_LIMIT', '4'))
+DEFAULT_MAX_WORKERS = 16
+# Seconds a cached response is reused before it is revalidated
+ARTICLE_CACHE_TTL = 24 * 60 * 60
+NEWS_CACHE_TTL = 15 * 60
+# News API base URL (can point at a local stand-in server for offline testing)
+NEWS_API_URL = os.environ.get('NEWS_API_URL', 'https://api.thenewsapi.com')
+
+_session = None
+_session_lock = threading.Lock()
+_pool_maxsize = DEFAULT_PER_HOST_LIMIT
+_host_semaphores = {}
+_prefetch_executor = None
+
+def _mount_adapter(session, pool_maxsize):
+    retry = Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(['GET', 'HEAD']),
+    )
+    adapter = HTTPAdapter(pool_connections=32, pool_maxsize=pool_maxsize, max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+def get_http_session(pool_maxsize=None):
+    """
+    Returns the shared requests session.
+
+    The session keeps connections alive per host and retries failed requests
+    with exponential backoff.
+
+    Parameters:
+    - pool_maxsize: Connections kept per host. The pool only ever grows: asking
+      for more than the current size remounts a larger one.
+    """
+    global _session, _pool_maxsize
+    with _session_lock:
+        if _session is None:
+            _pool_maxsize = max(_pool_maxsize, pool_maxsize or 0)
+            _session = requests.Session()
+            _mount_adapter(_session, _pool_maxsize)
+        elif pool_maxsize and pool_maxsize > _pool_maxsize:
+            _pool_maxsize = pool_maxsize
+            _mount_adapter(_session, _pool_maxsize)
+        return _session
+
+def _host(url):
+    return urllib.parse.urlsplit(url).netloc.lower()
+
+def _host_semaphore(url):
+    # One semaphore per host shared by every caller, so concurrent batches together
+    # stay within DEFAULT_PER_HOST_LIMIT (and the connection pool, which is sized to it)
+    host = _host(url)
+    with _session_lock:
+        if host not in _host_semaphores:
+            _host_semaphores[host] = threading.BoundedSemaphore(DEFAULT_PER_HOST_LIMIT)
+        return _host_semaphores[host]
+
+def _batch_host_semaphores(per_host_limit):
+    """
+    Per-host semaphores narrowing one batch of downloads to `per_host_limit`.
+
+    Returns None when the limit is not below the process-wide one, which applies anyway.
+    """
+    if per_host_limit is None or per_host_limit >= DEFAULT_PER_HOST_LIMIT:
+        return None
+    semaphores = {}
+    lock = threading.Lock()
+
+    def semaphore(url):
+        with lock:
+            return semaphores.setdefault(_host(url), threading.BoundedSemaphore(per_host_limit))
+    return semaphore
+
+def fetch_article_content(url, timeout=DEFAULT_TIMEOUT):
     """
     Fetches the full content of an article given its URL.
     
     Parameters:
     - url: The URL of the news article.
+    - timeout: (connect, read) timeout in seconds.
     
     Returns:
     - Full article content as a string or None if an error occurs.
     """
-    try:
-        response = requests.get(url)
-        response.raise_for_status()  # Check for HTTP request errors
-        soup = BeautifulSoup(response.content, 'html.parser')
+    def fetch(request_url, headers):
+        with span('network', op='article'), \
+                get_http_session().get(request_url, headers=headers, timeout=timeout, stream=True) as response:
+            if response.status_code != 304:
+                response.raise_for_status()  # Check for HTTP request errors
+            # Never read more of the page than the extractor will parse
+            body = bytearray()
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                body.extend(chunk)
+                if len(body) >= DEFAULT_MAX_BYTES:
+                    break
+            increment('network_bytes', min(len(body), DEFAULT_MAX_BYTES), op='article')
+            return response.status_code, response.headers, bytes(body[:DEFAULT_MAX_BYTES])
 
-        # Attempt to extract article content based on common patterns
-        paragraphs = soup.find_all('p')
-        content = ' '.join([p.get_text(strip=True) for p in paragraphs if p.get_text(strip=True)])
-        
-        return content.strip() if content else None
+    try:
+        with span('fetch_article'):
+            cache = get_http_cache()
+            if cache is None:
+                _, headers, body = fetch(url, {})
+            else:
+                headers, body = cache.get(url, fetch, ttl=ARTICLE_CACHE_TTL, include_headers=True)
+            with span('html_parse'):
+                return extract_article_text(body, encoding=charset_from_content_type(headers.get('content-type')))
 
     except Exception as e:
         print(f"Error fetching article content from {url}: {str(e)}")
         return None
+
+def _fetch_with_host_limit(url, batch_semaphores, timeout):
+    # The batch's own limit is taken first, so waiting on it never holds a shared slot
+    with batch_semaphores(url) if batch_semaphores else nullcontext(), _host_semaphore(url):
+        return fetch_article_content(url, timeout=timeout)
+
+def fetch_articles_content(urls, max_workers=DEFAULT_MAX_WORKERS, per_host_limit=None, timeout=DEFAULT_TIMEOUT):
+    """
+    Downloads many articles concurrently.
+    
+    Parameters:
+    - urls: Iterable of article URLs (duplicates are fetched once).
+    - max_workers: Size of the download thread pool.
+    - per_host_limit: Maximum concurrent downloads per host for this batch. It can
+      only narrow DEFAULT_PER_HOST_LIMIT (NEWS_PER_HOST_LIMIT), which caps all
+      callers together.
+    - timeout: (connect, read) timeout in seconds.
+    
+    Yields:
+    - (url, content) tuples in completion order; content is None on failure.
+    """
+    unique_urls = list(dict.fromkeys(urls))
+    if not unique_urls:
+        return
+    batch_semaphores = _batch_host_semaphores(per_host_limit)
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(unique_urls))) as executor:
+        futures = {
+            executor.submit(_fetch_with_host_limit, url, batch_semaphores, timeout): url
+            for url in unique_urls
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+def prefetch_articles_content(urls, per_host_limit=None, timeout=DEFAULT_TIMEOUT):
+    """
+    Starts downloading articles in the background and returns immediately.
+
+    `per_host_limit` narrows this batch as in fetch_articles_content.
+    
+    Returns:
+    - Dictionary mapping each URL to a Future resolving to its content.
+    """
+    global _prefetch_executor
+    with _session_lock:
+        if _prefetch_executor is None:
+            _prefetch_executor = ThreadPoolExecutor(max_workers=DEFAULT_MAX_WORKERS, thread_name_prefix='article-prefetch')
+    batch_semaphores = _batch_host_semaphores(per_host_limit)
+    return {
+        url: _prefetch_executor.submit(_fetch_with_host_limit, url, batch_semaphores, timeout)
+        for url in dict.fromkeys(urls)
+    }
+    
+def _news_api_request(url, headers):
+    parts = urllib.parse.urlsplit(url)
+    connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+    conn = connection_class(parts.netloc, timeout=DEFAULT_TIMEOUT[1])
+    try:
+        with span('network', op='news_api'):
+            conn.request('GET', f'{parts.path}?{parts.query}', headers=headers)
+            res = conn.getresponse()
+            body = res.read()
+        increment('network_bytes', len(body), op='news_api')
+        return res.status, dict(res.getheaders()), body
+    finally:
+        conn.close()
+
+def _article_record(article):
+    return {
+        'title': article['title'],
+        'content': article['description'] or "",  # Use description for content if available
+        'source': article['source'],
+        'url': article['url']
+    }
+
+def fetch_news_page(query, api_key, page=1, limit=None, published_after=None, base_url=None):
+    """
+    Fetches one page of search results from the News API, bypassing the HTTP cache.
+    
+    Parameters:
+    - query: The topic to search for news articles.
+    - api_key: Your News API key.
+    - page: 1-based page number.
+    - limit: Articles per page (None uses the API's default for the plan).
+    - published_after: Only return articles published after this ISO timestamp.
+    - base_url: API base URL (defaults to NEWS_API_URL).
     
+    Returns:
+    - (articles, meta): article dictionaries (as in fetch_news, plus 'published_at')
+      and the response's pagination metadata ('found', 'returned', 'limit', 'page').
+    """
+    params = {'q': query, 'api_token': api_key, 'language': 'en', 'sort': 'published_at', 'page': page}
+    if limit:
+        params['limit'] = limit
+    if published_after:
+        params['published_after'] = published_after
+    url = f'{base_url or NEWS_API_URL}/v1/news/all?{urllib.parse.urlencode(params)}'
+
+    with span('fetch_news_page'):
+        status, _, data = _news_api_request(url, {})
+    if status != 200:
+        raise RuntimeError(f"News API returned HTTP {status}: {data[:200]!r}")
+    payload = json.loads(data.decode('utf-8'))
+    articles = [dict(_article_record(article), published_at=article.get('published_at'))
+                for article in payload.get('data', [])]
+    return articles, payload.get('meta', {})
+
+def is_last_page(articles, meta, page, limit=None):
+    """Whether a page returned by fetch_news_page is the last one of its search."""
+    returned = meta.get('returned', len(articles))
+    found = meta.get('found')
+    page_limit = meta.get('limit') or limit or returned
+    return not articles or returned < page_limit or (found is not None and page * page_limit >= found)
+
+def fetch_news_pages(query, api_key, max_pages=5, limit=None, published_after=None, base_url=None):
+    """
+    Pages through search results until the API runs out of them or `max_pages` is reached.
+    
+    Yields:
+    - Article dictionaries, as returned by fetch_news_page.
+    """
+    for page in range(1, max_pages + 1):
+        articles, meta = fetch_news_page(query, api_key, page, limit, published_after, base_url)
+        yield from articles
+        if is_last_page(articles, meta, page, limit):
+            return
+
 def fetch_news(query="technology", api_key="YOUR_NEWSAPI_KEY"):
     """
     Fetches news articles based on a topic using News API.
@@ -40,29 +265,27 @@ def fetch_news(query="technology", api_key="YOUR_NEWSAPI_KEY"):
     Returns:
     - A DataFrame containing news article details.
     """
-    conn = http.client.HTTPSConnection('api.thenewsapi.com')
     params = urllib.parse.urlencode({
         'q': query,
         'api_token': api_key,
         'language': 'en',  # Fetch only English articles
         'sort': 'relevance'  # Sort by relevancy to the query
     })
+    url = f'{NEWS_API_URL}/v1/news/all?{params}'
 
     try:
-        conn.request('GET', f'/v1/news/all?{params}')
-
-        res = conn.getresponse()
-        data = res.read()
+        with span('fetch_news'):
+            cache = get_http_cache()
+            if cache is None:
+                data = _news_api_request(url, {})[2]
+            else:
+                # The API token is left out of the cache key so it is never stored
+                data = cache.get(url, _news_api_request, ttl=NEWS_CACHE_TTL, exclude_params=('api_token',))
 
         print(data.decode('utf-8'))
         articles_data = json.loads(data.decode('utf-8')).get('data', [])
         
-        articles = [{
-            'title': article['title'],
-            'content': article['description'] or "",  # Use description for content if available
-            'source': article['source'],
-            'url': article['url']
-        } for article in articles_data]
+        articles = [_article_record(article) for article in articles_data]
 
         news_df = pd.DataFrame(articles)
         return news_df
@@ -0,0 +1,214 @@
+# app/dedup_index.py
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from .http_cache import normalize_url
+
+DEFAULT_INDEX_PATH = os.environ.get('NEWS_DEDUP_INDEX_PATH', os.path.join('.cache', 'dedup_index.sqlite3'))
+DEFAULT_MAX_ENTRIES = int(os.environ.get('NEWS_DEDUP_MAX_ENTRIES', '100000'))
+# Estimated Jaccard similarity at or above which two stories count as the same
+DEFAULT_THRESHOLD = 0.7
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_WORD_RE = re.compile(r'[a-z0-9]+')
+
+
+def shingles(text, size=3):
+    """Set of word `size`-grams of the lower-cased text (the whole text for shorter ones)."""
+    words = _WORD_RE.findall(str(text).lower())
+    if len(words) < size:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class MinHasher:
+    """
+    MinHash signatures: for each of `num_perm` random hash functions
+    (a * x + b) mod p, the minimum over the text's hashed shingles.
+
+    The share of equal positions in two signatures estimates the Jaccard
+    similarity of the shingle sets.
+    """
+
+    def __init__(self, num_perm=128, shingle_size=3, seed=1):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        # a, x < 2**32 keeps a * x + b inside uint64
+        self._a = rng.randint(1, 1 << 31, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 31, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text):
+        """The text's MinHash signature, or None if it has no shingles (no words)."""
+        hashed = np.fromiter(
+            (zlib.crc32(shingle.encode('utf-8')) for shingle in shingles(text, self.shingle_size)),
+            dtype=np.uint64,
+        )
+        if len(hashed) == 0:
+            return None
+        permuted = (np.outer(hashed, self._a) + self._b) % np.uint64(_MERSENNE_PRIME)
+        return permuted.min(axis=0)
+
+
+def estimated_similarity(signature, other):
+    return float(np.mean(signature == other))
+
+
+class DedupIndex:
+    """
+    Persistent record of seen article URLs plus a MinHash/LSH index of their text.
+
+    Signatures are split into `bands` bands; stories sharing any band bucket
+    are candidates and count as near-duplicates when their estimated Jaccard
+    similarity reaches `threshold`. Entries are stored in a single SQLite file
+    (':memory:' for a throwaway index) and the oldest are dropped once there
+    are more than `max_entries`.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH, max_entries=DEFAULT_MAX_ENTRIES, threshold=DEFAULT_THRESHOLD,
+                 num_perm=128, bands=32):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.path = path
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm)
+        self._lock = threading.Lock()
+        self.new = 0
+        self.seen_urls = 0
+        self.near_duplicates = 0
+        self.evictions = 0
+
+        if path != ':memory:' and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ':memory:':
+            self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS stories ('
+            ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+            ' url TEXT UNIQUE,'
+            ' signature BLOB,'
+            ' added_at REAL)'
+        )
+        self._conn.execute('CREATE TABLE IF NOT EXISTS buckets (band INTEGER, bucket INTEGER, story_id INTEGER)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS buckets_lookup ON buckets (band, bucket)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS buckets_story ON buckets (story_id)')
+        self._conn.commit()
+
+    def _band_buckets(self, signature):
+        for band in range(self.bands):
+            chunk = signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            digest = hashlib.blake2b(chunk, digest_size=8).digest()
+            yield band, int.from_bytes(digest, 'big', signed=True)
+
+    def _find_duplicate(self, signature):
+        candidates = set()
+        for band, bucket in self._band_buckets(signature):
+            rows = self._conn.execute(
+                'SELECT story_id FROM buckets WHERE band = ? AND bucket = ?', (band, bucket)
+            ).fetchall()
+            candidates.update(story_id for (story_id,) in rows)
+        best_url, best_similarity = None, self.threshold
+        for story_id in candidates:
+            row = self._conn.execute('SELECT url, signature FROM stories WHERE id = ?', (story_id,)).fetchone()
+            if row is None:
+                continue
+            similarity = estimated_similarity(signature, np.frombuffer(row[1], dtype=np.uint64))
+            if similarity >= best_similarity:
+                best_url, best_similarity = row[0], similarity
+        return best_url
+
+    def check(self, url, text, add=True):
+        """
+        Classifies a story and, unless `add` is False, records it.
+
+        Returns:
+        - ('new', None), ('seen_url', url) or ('near_duplicate', url of the
+          earlier story it matches).
+        """
+        key = normalize_url(url) if url else None
+        signature = self.hasher.signature(text)
+        with self._lock:
+            if key is not None and self._conn.execute('SELECT 1 FROM stories WHERE url = ?', (key,)).fetchone():
+                self.seen_urls += 1
+                return 'seen_url', url
+
+            # Stories without text have nothing to compare, so only their URL is checked
+            duplicate_of = self._find_duplicate(signature) if signature is not None else None
+            if add:
+                # Near-duplicates are recorded too, so their URLs are not reconsidered
+                cursor = self._conn.execute(
+                    'INSERT OR IGNORE INTO stories (url, signature, added_at) VALUES (?, ?, ?)',
+                    (key, signature.tobytes() if signature is not None else b'', time.time()),
+                )
+                if duplicate_of is None and signature is not None:
+                    self._conn.executemany(
+                        'INSERT INTO buckets VALUES (?, ?, ?)',
+                        [(band, bucket, cursor.lastrowid) for band, bucket in self._band_buckets(signature)],
+                    )
+                self._evict()
+                self._conn.commit()
+
+        if duplicate_of is not None:
+            self.near_duplicates += 1
+            return 'near_duplicate', duplicate_of
+        self.new += 1
+        return 'new', None
+
+    def is_novel(self, url, text):
+        """Records the story and returns True if it was neither seen nor a near-duplicate."""
+        return self.check(url, text)[0] == 'new'
+
+    def _evict(self):
+        excess = self._conn.execute('SELECT COUNT(*) FROM stories').fetchone()[0] - self.max_entries
+        if excess <= 0:
+            return
+        oldest = [row[0] for row in self._conn.execute('SELECT id FROM stories ORDER BY id LIMIT ?', (excess,))]
+        self._conn.executemany('DELETE FROM buckets WHERE story_id = ?', [(story_id,) for story_id in oldest])
+        self._conn.executemany('DELETE FROM stories WHERE id = ?', [(story_id,) for story_id in oldest])
+        self.evictions += len(oldest)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM buckets')
+            self._conn.execute('DELETE FROM stories')
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM stories').fetchone()[0]
+
+    def stats(self):
+        return {
+            'new': self.new,
+            'seen_urls': self.seen_urls,
+            'near_duplicates': self.near_duplicates,
+            'evictions': self.evictions,
+            'entries': len(self),
+        }
+
+
+def drop_near_duplicates(df, text_columns=('title', 'content'), url_column='url', threshold=DEFAULT_THRESHOLD):
+    """
+    Drops repeated and near-duplicate rows (e.g. one wire story under several
+    sources) from a DataFrame of articles, keeping the first copy.
+    """
+    if df.empty:
+        return df
+    index = DedupIndex(':memory:', max_entries=len(df), threshold=threshold)
+    # Missing values (None, NaN) count as empty text, not as the word 'nan'
+    keep = [
+        index.is_novel(row[url_column], ' '.join(row[column] for column in text_columns if isinstance(row[column], str)))
+        for _, row in df.iterrows()
+    ]
+    return df[keep].reset_index(drop=True)
@@ -0,0 +1,178 @@
+# app/html_extraction.py
+import codecs
+import os
+import re
+from bs4 import BeautifulSoup, CData, NavigableString, Tag
+
+try:
+    from lxml import etree
+except ImportError:  # lxml is optional, BeautifulSoup is always available
+    etree = None
+
+# Default extraction backend: 'lxml' (streaming) or 'bs4' (BeautifulSoup html.parser)
+DEFAULT_BACKEND = os.environ.get('NEWS_HTML_BACKEND', 'lxml')
+# Stop extracting once this many bytes of HTML or paragraphs have been consumed
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024
+DEFAULT_MAX_PARAGRAPHS = 500
+# Subtrees that never contain article text. Layout containers (header, form, aside...)
+# are kept: pages wrap the lede in <header> or the whole body in a <form>.
+SKIPPED_TAGS = frozenset(['script', 'style', 'noscript', 'template', 'nav'])
+# Elements that implicitly close an open <p> in libxml2, ending the paragraph's text
+_PARAGRAPH_CLOSING_TAGS = frozenset([
+    'address', 'blockquote', 'center', 'dir', 'div', 'dl', 'dd', 'dt', 'fieldset', 'form', 'h1', 'h2', 'h3',
+    'h4', 'h5', 'h6', 'hr', 'li', 'listing', 'menu', 'ol', 'p', 'pre', 'table', 'ul', 'xmp', 'caption', 'col',
+    'colgroup', 'tbody', 'td', 'th', 'tr', 'tfoot',
+])
+
+_CHUNK_SIZE = 64 * 1024
+_META_CHARSET = re.compile(rb'<meta[^>]+charset', re.IGNORECASE)
+# String types BeautifulSoup's get_text() includes (comments and the like are left out)
+_TEXT_TYPES = (NavigableString, CData)
+
+
+def _join_paragraphs(paragraphs):
+    content = ' '.join(text for text in paragraphs if text)
+    return content.strip() if content else None
+
+
+def charset_from_content_type(content_type):
+    """The charset parameter of a Content-Type header value, or None."""
+    match = re.search(r'charset=[\'"]?([\w.:-]+)', content_type or '', re.IGNORECASE)
+    return match.group(1) if match else None
+
+
+def _detect_encoding(html):
+    """
+    Encoding of an HTML page that came without a declared charset.
+
+    Pages with a <meta charset> are left to lxml (None). Otherwise UTF-8 is used
+    when the bytes decode as UTF-8, which libxml2 would read as latin-1.
+    """
+    if _META_CHARSET.search(html[:_CHUNK_SIZE]):
+        return None
+    try:
+        # Incremental so a multi-byte character cut off at the end does not count as invalid
+        codecs.getincrementaldecoder('utf-8')().decode(html)
+    except UnicodeDecodeError:
+        return None
+    return 'utf-8'
+
+
+def _paragraph_text_bs4(p):
+    # html.parser never closes <p> implicitly, so the paragraph is cut where lxml would close it
+    parts = []
+    for node in p.descendants:
+        if isinstance(node, Tag):
+            if node.name in _PARAGRAPH_CLOSING_TAGS:
+                break
+        elif type(node) in _TEXT_TYPES:
+            parts.append(node.strip())
+    return ''.join(parts)
+
+
+def extract_paragraphs_bs4(html, max_paragraphs=None, encoding=None):
+    """
+    Extracts paragraph texts with BeautifulSoup's html.parser.
+
+    Skips the same script/style/navigation subtrees as extract_paragraphs_lxml
+    and ends a paragraph at the block element libxml2 would close it at, so both
+    backends return the same paragraphs.
+    """
+    if not html:
+        return []
+    soup = BeautifulSoup(html, 'html.parser', from_encoding=encoding if isinstance(html, bytes) else None)
+    # Emptied rather than removed: a skipped block element (<nav>) still ends an open paragraph
+    for element in soup.find_all(SKIPPED_TAGS):
+        element.clear()
+    return [_paragraph_text_bs4(p) for p in soup.find_all('p', limit=max_paragraphs)]
+
+
+def extract_paragraphs_lxml(html, max_bytes=DEFAULT_MAX_BYTES, max_paragraphs=DEFAULT_MAX_PARAGRAPHS, encoding=None):
+    """
+    Extracts paragraph texts with lxml's incremental HTML parser.
+
+    The document is fed in chunks and parsing stops as soon as `max_bytes` of
+    HTML or `max_paragraphs` paragraphs have been consumed. Paragraphs inside
+    script/style/navigation subtrees are skipped, and finished subtrees are
+    cleared so memory stays flat on large pages.
+
+    Parameters:
+    - encoding: Charset of byte input (e.g. from the Content-Type header). When
+      None it is taken from the page's <meta charset>, or UTF-8 if the page
+      decodes as UTF-8.
+    """
+    if isinstance(html, str):
+        html, encoding = html.encode('utf-8'), 'utf-8'
+    html = html[:max_bytes]
+    if not html.strip():
+        return []
+    if encoding is None:
+        encoding = _detect_encoding(html)
+
+    parser = etree.HTMLPullParser(events=('start', 'end'), encoding=encoding)
+    paragraphs = []
+    skip_depth = 0
+    paragraph_depth = 0
+
+    def collect():
+        """Handles the queued parser events; True once `max_paragraphs` are collected."""
+        nonlocal skip_depth, paragraph_depth
+        for event, element in parser.read_events():
+            tag = element.tag if isinstance(element.tag, str) else ''
+            if event == 'start':
+                if tag in SKIPPED_TAGS:
+                    skip_depth += 1
+                elif tag == 'p':
+                    paragraph_depth += 1
+                continue
+
+            if tag in SKIPPED_TAGS:
+                skip_depth -= 1
+                # Inside a paragraph only the skipped subtree goes; the text after it is kept
+                element.clear(keep_tail=paragraph_depth > 0)
+                continue
+            if tag == 'p':
+                paragraph_depth -= 1
+                if skip_depth == 0:
+                    paragraphs.append(''.join(text.strip() for text in element.itertext()))
+                    if len(paragraphs) >= max_paragraphs:
+                        return True
+            # Children of an open paragraph are still needed for its text
+            if paragraph_depth == 0:
+                element.clear()
+        return False
+
+    for offset in range(0, len(html), _CHUNK_SIZE):
+        parser.feed(html[offset:offset + _CHUNK_SIZE])
+        if collect():
+            return paragraphs
+
+    # Closing flushes elements still open at the end of the input, e.g. a trailing <p>
+    parser.close()
+    collect()
+    return paragraphs
+
+
+def extract_article_text(html, backend=None, max_bytes=DEFAULT_MAX_BYTES, max_paragraphs=DEFAULT_MAX_PARAGRAPHS,
+                         encoding=None):
+    """
+    Joins the text of all non-empty <p> elements of an HTML page.
+
+    Parameters:
+    - html: Page HTML as bytes or str.
+    - backend: 'lxml' or 'bs4'; defaults to NEWS_HTML_BACKEND. Falls back to
+      BeautifulSoup if lxml is unavailable or fails on the page.
+    - max_bytes: Maximum number of HTML bytes parsed by the lxml backend.
+    - max_paragraphs: Maximum number of paragraphs extracted.
+    - encoding: Charset of byte input, e.g. from the HTTP Content-Type header.
+
+    Returns:
+    - Article content as a string, or None if no paragraph text was found.
+    """
+    backend = backend or DEFAULT_BACKEND
+    if backend == 'lxml' and etree is not None:
+        try:
+            return _join_paragraphs(extract_paragraphs_lxml(html, max_bytes, max_paragraphs, encoding))
+        except (etree.Error, ValueError, LookupError) as e:
+            print(f"lxml extraction failed, falling back to BeautifulSoup: {e}")
+    return _join_paragraphs(extract_paragraphs_bs4(html, max_paragraphs, encoding))
@@ -0,0 +1,199 @@
+# app/http_cache.py
+import json
+import os
+import sqlite3
+import threading
+import time
+import urllib.parse
+import zlib
+
+DEFAULT_CACHE_PATH = os.environ.get('NEWS_HTTP_CACHE_PATH', os.path.join('.cache', 'http_cache.sqlite3'))
+DEFAULT_MAX_BYTES = int(os.environ.get('NEWS_HTTP_CACHE_MAX_MB', '256')) * 1024 * 1024
+
+
+def normalize_url(url, exclude_params=()):
+    """
+    Normalizes a URL into a cache key.
+
+    Scheme and host are lower-cased, default ports and fragments are dropped and
+    query parameters are sorted. Parameters in `exclude_params` (e.g. API tokens)
+    are removed so they never end up in the key.
+    """
+    parts = urllib.parse.urlsplit(url)
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    if (scheme, parts.port) in (('http', 80), ('https', 443)):
+        netloc = netloc.rsplit(':', 1)[0]
+    query = sorted(
+        (key, value)
+        for key, value in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+        if key not in exclude_params
+    )
+    return urllib.parse.urlunsplit((scheme, netloc, parts.path or '/', urllib.parse.urlencode(query), ''))
+
+
+class HttpCache:
+    """
+    Persistent HTTP response cache stored in a single SQLite file.
+
+    Bodies are stored zlib-compressed. Entries younger than their TTL are served
+    directly; older entries with an ETag or Last-Modified header are revalidated
+    with a conditional request. The least recently used entries are evicted when
+    the total compressed size exceeds `max_bytes`.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            ' key TEXT PRIMARY KEY,'
+            ' status INTEGER,'
+            ' headers TEXT,'
+            ' body BLOB,'
+            ' etag TEXT,'
+            ' last_modified TEXT,'
+            ' stored_at REAL,'
+            ' last_access REAL,'
+            ' size INTEGER)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)')
+        self._conn.commit()
+
+    def lookup(self, key):
+        """Returns the cached entry for `key` as a dictionary, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT status, headers, body, etag, last_modified, stored_at FROM responses WHERE key = ?',
+                (key,),
+            ).fetchone()
+        if row is None:
+            return None
+        status, headers, body, etag, last_modified, stored_at = row
+        return {
+            'status': status,
+            'headers': json.loads(headers),
+            'body': zlib.decompress(body),
+            'etag': etag,
+            'last_modified': last_modified,
+            'stored_at': stored_at,
+        }
+
+    def store(self, key, status, headers, body):
+        headers = {k.lower(): v for k, v in dict(headers).items()}
+        compressed = zlib.compress(body)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, status, json.dumps(headers), compressed, headers.get('etag'),
+                 headers.get('last-modified'), now, now, len(compressed)),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _touch(self, key, refreshed=False):
+        now = time.time()
+        with self._lock:
+            if refreshed:
+                self._conn.execute('UPDATE responses SET stored_at = ?, last_access = ? WHERE key = ?', (now, now, key))
+            else:
+                self._conn.execute('UPDATE responses SET last_access = ? WHERE key = ?', (now, key))
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute('SELECT key, size FROM responses ORDER BY last_access').fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+            total -= size
+            self.evictions += 1
+
+    def get(self, url, fetch, ttl, exclude_params=(), include_headers=False):
+        """
+        Returns the body for `url`, from the cache when possible.
+
+        Parameters:
+        - url: Request URL.
+        - fetch: Callable(url, headers) -> (status, headers, body) performing the real request.
+        - ttl: Seconds a stored response is served without revalidation.
+        - exclude_params: Query parameters left out of the cache key.
+        - include_headers: Return (headers, body), with lower-cased header names.
+
+        Returns:
+        - Response body as bytes. Non-200 responses are returned but never stored.
+        """
+        key = normalize_url(url, exclude_params)
+        entry = self.lookup(key)
+
+        def result(headers, body):
+            return ({k.lower(): v for k, v in dict(headers).items()}, body) if include_headers else body
+
+        if entry is not None and time.time() - entry['stored_at'] < ttl:
+            self.hits += 1
+            self._touch(key)
+            return result(entry['headers'], entry['body'])
+
+        conditional = {}
+        if entry is not None:
+            if entry['etag']:
+                conditional['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                conditional['If-Modified-Since'] = entry['last_modified']
+
+        status, headers, body = fetch(url, conditional)
+        if status == 304 and entry is not None:
+            self.revalidations += 1
+            self.hits += 1
+            self._touch(key, refreshed=True)
+            return result(entry['headers'], entry['body'])
+
+        self.misses += 1
+        if status == 200:
+            self.store(key, status, headers, body)
+        return result(headers, body)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM responses')
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'revalidations': self.revalidations,
+            'evictions': self.evictions,
+            'entries': entries,
+            'bytes': size,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_http_cache():
+    """Returns the process-wide cache, or None when disabled with NEWS_HTTP_CACHE=0."""
+    global _cache
+    if os.environ.get('NEWS_HTTP_CACHE', '1') == '0':
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = HttpCache()
+        return _cache
@@ -0,0 +1,316 @@
+# app/inference_server.py
+"""
+Local inference server with cross-request dynamic micro-batching.
+
+Usage:
+    python -m app.inference_server --port 8765 --max-batch-size 16 --max-wait-ms 10
+
+Clients (the Streamlit app, batch jobs) send texts over HTTP; every text is
+queued per model and coalesced with texts from other requests into
+micro-batches, so one copy of each model serves all sessions.
+
+Endpoints:
+    POST /v1/classification   {"texts": [...]} -> {"results": [...]}
+    POST /v1/sentiment        {"texts": [...]} -> {"results": [...]}
+    POST /v1/summarization    {"texts": [...]} -> {"results": [...]}
+    GET  /metrics             queue depth, batch-size histogram and counters
+    GET  /metrics/prometheus  stage timings, token and batch counters (Prometheus text format)
+"""
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from .instrumentation import observe, prometheus_text
+
+DEFAULT_PORT = 8765
+# URL of a running server; when set, the app and batch jobs use it instead of local models
+INFERENCE_URL_ENV = 'NEWS_INFERENCE_URL'
+
+
+class MicroBatcher:
+    """
+    Queues single items for one model and runs them in micro-batches.
+
+    A batch is dispatched when it reaches `max_batch_size` items or when the
+    oldest queued item has waited `max_wait_ms`, whichever comes first.
+    """
+
+    def __init__(self, name, batch_fn, max_batch_size=16, max_wait_ms=10):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batch_sizes = Counter()
+        self.requests = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self._queue = None
+        self._task = None
+        # One thread per model: the model is never run concurrently with itself
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'batcher-{name}')
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._executor.shutdown(wait=False)
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def submit(self, item):
+        """Queues one item and returns a future resolving to its result."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.put_nowait((item, future, loop.time()))
+        self.requests += 1
+        return future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            items = [item for item, _, _ in batch]
+            self.batch_sizes[len(batch)] += 1
+            observe('micro_batch_size', len(batch), stage=self.name)
+            observe('queue_wait_seconds', loop.time() - batch[0][2], stage=self.name)
+            start = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(self._executor, self.batch_fn, items)
+                if len(results) != len(batch):
+                    # zip() would leave the unmatched futures, and their clients, waiting forever
+                    raise RuntimeError(f"{self.name} returned {len(results)} results for {len(batch)} items")
+            except Exception as e:
+                self.errors += 1
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for (_, future, _), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+            finally:
+                self.busy_seconds += time.perf_counter() - start
+
+    def metrics(self):
+        return {
+            'queue_depth': self.queue_depth,
+            'requests': self.requests,
+            'batches': sum(self.batch_sizes.values()),
+            'errors': self.errors,
+            'busy_seconds': self.busy_seconds,
+            'batch_size_histogram': {str(size): count for size, count in sorted(self.batch_sizes.items())},
+        }
+
+
+def _classification_batch(texts):
+    from .category_classification import classify_news_batch
+    return classify_news_batch(texts)
+
+def _sentiment_batch(texts):
+    from .sentiment_analysis import sentiment_analysis_batch
+    return sentiment_analysis_batch(texts)
+
+def _summarization_batch(texts):
+    from .summarization import abstractive_summarize_batch
+    return abstractive_summarize_batch(texts)
+
+STAGE_BATCH_FUNCTIONS = {
+    'classification': _classification_batch,
+    'sentiment': _sentiment_batch,
+    'summarization': _summarization_batch,
+}
+
+
+class InferenceServer:
+    """Minimal asyncio HTTP/1.1 JSON server in front of one MicroBatcher per stage."""
+
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT, max_batch_size=16, max_wait_ms=10):
+        self.host = host
+        self.port = port
+        self.batchers = {
+            stage: MicroBatcher(stage, fn, max_batch_size, max_wait_ms)
+            for stage, fn in STAGE_BATCH_FUNCTIONS.items()
+        }
+        self._server = None
+        self._connections = set()
+
+    async def start(self):
+        for batcher in self.batchers.values():
+            batcher.start()
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            # Idle keep-alive connections would otherwise keep their handlers (and wait_closed) waiting
+            for task in self._connections:
+                task.cancel()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+            await self._server.wait_closed()
+        for batcher in self.batchers.values():
+            await batcher.stop()
+
+    async def serve_forever(self):
+        await self.start()
+        print(f"Inference server listening on http://{self.host}:{self.port}")
+        async with self._server:
+            await self._server.serve_forever()
+
+    def metrics(self):
+        return {stage: batcher.metrics() for stage, batcher in self.batchers.items()}
+
+    async def _handle_connection(self, reader, writer):
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            # Keep-alive: serve requests until the client closes the connection
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    key, _, value = line.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0) or 0))
+
+                status, payload = await self._dispatch(method, path, body)
+                if isinstance(payload, str):
+                    content_type, data = 'text/plain; version=0.0.4', payload.encode('utf-8')
+                else:
+                    content_type, data = 'application/json', json.dumps(payload).encode('utf-8')
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                    f"Content-Length: {len(data)}\r\nConnection: keep-alive\r\n\r\n".encode('latin-1') + data
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        except asyncio.CancelledError:
+            # Cancelled by stop(); asyncio.streams logs a traceback for handlers that end cancelled
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    async def _dispatch(self, method, path, body):
+        if method == 'GET' and path == '/metrics':
+            return '200 OK', self.metrics()
+        if method == 'GET' and path == '/metrics/prometheus':
+            return '200 OK', prometheus_text()
+
+        stage = path.rsplit('/', 1)[-1]
+        if method != 'POST' or not path.startswith('/v1/') or stage not in self.batchers:
+            return '404 Not Found', {'error': f'unknown endpoint {method} {path}'}
+        try:
+            texts = json.loads(body)['texts']
+        except (ValueError, KeyError, TypeError):
+            return '400 Bad Request', {'error': 'expected a JSON body like {"texts": [...]}'}
+
+        # Each text is queued on its own so it can share a batch with other requests
+        futures = [self.batchers[stage].submit(str(text)) for text in texts]
+        try:
+            results = await asyncio.gather(*futures)
+        except Exception as e:
+            return '500 Internal Server Error', {'error': f"{type(e).__name__}: {e}"}
+        return '200 OK', {'results': results}
+
+
+class InferenceClient:
+    """Thin client for InferenceServer; one pooled HTTP session per client."""
+
+    def __init__(self, base_url, timeout=300):
+        import requests
+
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self._session = requests.Session()
+
+    def _post(self, stage, texts):
+        response = self._session.post(f'{self.base_url}/v1/{stage}', json={'texts': list(texts)}, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()['results']
+
+    def classify(self, texts):
+        return self._post('classification', texts)
+
+    def sentiment(self, texts):
+        return self._post('sentiment', texts)
+
+    def summarize(self, texts):
+        return self._post('summarization', texts)
+
+    def metrics(self):
+        response = self._session.get(f'{self.base_url}/metrics', timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_inference_client():
+    """Returns a client for NEWS_INFERENCE_URL, or None to run models in-process."""
+    global _client
+    url = os.environ.get(INFERENCE_URL_ENV)
+    if not url:
+        return None
+    with _client_lock:
+        if _client is None or _client.base_url != url.rstrip('/'):
+            _client = InferenceClient(url)
+        return _client
+
+
+def main():
+    from .model_registry import warm_models
+    from .backends import stage_model_name
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--max-batch-size', type=int, default=16)
+    parser.add_argument('--max-wait-ms', type=float, default=10)
+    args = parser.parse_args()
+
+    warm_models([stage_model_name(stage) for stage in STAGE_BATCH_FUNCTIONS] + ['sentencizer'], background=False)
+    server = InferenceServer(args.host, args.port, args.max_batch_size, args.max_wait_ms)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# app/ingestion.py
+"""
+Incremental news ingestion: pages through a query's results, polls it on an
+interval and passes on only stories not seen before.
+
+Usage:
+    python -m app.ingestion --query technology --interval 300 --output novel.jsonl
+    python -m app.ingestion --query technology --iterations 1 --max-pages 10
+
+Seen URLs and a MinHash/LSH index of every story's title and description are
+kept in a persistent DedupIndex, so syndicated copies of a wire story under
+other sources and URLs are dropped before they reach the analysis stages.
+The JSONL output can be fed to `python -m app.batch_pipeline`. Point
+NEWS_API_URL at `python -m app.news_api_stub` to run against local data.
+"""
+import argparse
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+from .data_collection import fetch_news_page, is_last_page
+from .dedup_index import DedupIndex
+from .instrumentation import increment
+
+DEFAULT_INTERVAL = 300
+# Polls re-request this much before the newest article already seen; repeats are dropped as seen URLs
+WATERMARK_OVERLAP = timedelta(minutes=1)
+
+
+def _parse_timestamp(value):
+    try:
+        return datetime.fromisoformat(str(value)[:19])
+    except ValueError:
+        return None
+
+
+class NewsIngestor:
+    """
+    Polls one News API query and returns only novel articles.
+
+    Parameters:
+    - query: Search query.
+    - api_key: News API key.
+    - index: DedupIndex shared across polls (and runs, when persisted).
+    - max_pages: Pages requested per poll. A backlog larger than max_pages * limit
+      is fetched over several polls.
+    - limit: Articles per page (None uses the API's default).
+    - base_url: API base URL (defaults to NEWS_API_URL).
+    """
+
+    def __init__(self, query, api_key, index=None, max_pages=5, limit=None, base_url=None):
+        self.query = query
+        self.api_key = api_key
+        self.index = index if index is not None else DedupIndex()
+        self.max_pages = max_pages
+        self.limit = limit
+        self.base_url = base_url
+        self.newest_seen = None
+        # While a backlog is drained: (published_after, next page, newest story seen so far)
+        self._backlog = None
+
+    def poll_once(self):
+        """
+        Fetches up to `max_pages` pages of articles published since the last poll.
+
+        Pages come newest first. If a poll reaches `max_pages` before the results
+        run out, the next poll continues at the following page with the same
+        cut-off, and the watermark only advances once the results are exhausted,
+        so older articles of a large burst are never skipped. Articles published
+        in the meantime push older ones to later pages, which can only cause
+        repeats (dropped as seen URLs), not gaps. If a page fails, nothing is
+        recorded and the next poll retries the same pages.
+
+        Returns:
+        - List of novel article dictionaries, oldest pages last as the API returns them.
+        """
+        if self._backlog is not None:
+            published_after, first_page, newest = self._backlog
+        else:
+            published_after, first_page, newest = None, 1, self.newest_seen
+            if self.newest_seen is not None:
+                published_after = (self.newest_seen - WATERMARK_OVERLAP).strftime('%Y-%m-%dT%H:%M:%S')
+
+        fetched = []
+        exhausted = False
+        for page in range(first_page, first_page + self.max_pages):
+            articles, meta = fetch_news_page(self.query, self.api_key, page, self.limit, published_after, self.base_url)
+            fetched.extend(articles)
+            if is_last_page(articles, meta, page, self.limit):
+                exhausted = True
+                break
+
+        # Stories are only recorded once every page has arrived: after a failed page
+        # the next poll fetches them again instead of finding them already seen
+        novel = []
+        for article in fetched:
+            published = _parse_timestamp(article.get('published_at'))
+            if published is not None and (newest is None or published > newest):
+                newest = published
+
+            status, _ = self.index.check(article['url'], f"{article['title']} {article['content']}")
+            increment('ingested_articles', status=status)
+            if status == 'new':
+                novel.append(article)
+
+        if exhausted:
+            self.newest_seen, self._backlog = newest, None
+        else:
+            self._backlog = (published_after, first_page + self.max_pages, newest)
+        return novel
+
+    def poll(self, interval=DEFAULT_INTERVAL, iterations=None, stop_event=None):
+        """
+        Polls every `interval` seconds.
+
+        Parameters:
+        - iterations: Number of polls (None polls until `stop_event` is set).
+        - stop_event: Optional threading.Event ending the loop.
+
+        Yields:
+        - The list of novel articles from each poll (possibly empty).
+        """
+        stop_event = stop_event or threading.Event()
+        count = 0
+        while not stop_event.is_set():
+            try:
+                yield self.poll_once()
+            except Exception as e:
+                print(f"Error polling news for '{self.query}': {e}")
+            count += 1
+            if iterations is not None and count >= iterations:
+                return
+            stop_event.wait(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--query', default='technology')
+    parser.add_argument('--api-key', default=os.environ.get('NEWS_API_KEY', 'YOUR_NEWSAPI_KEY'))
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL, help='Seconds between polls')
+    parser.add_argument('--iterations', type=int, help='Stop after this many polls')
+    parser.add_argument('--max-pages', type=int, default=5)
+    parser.add_argument('--limit', type=int, help='Articles per page')
+    parser.add_argument('--output', help='Append novel articles to this JSONL file')
+    args = parser.parse_args()
+
+    ingestor = NewsIngestor(args.query, args.api_key, max_pages=args.max_pages, limit=args.limit)
+    try:
+        for articles in ingestor.poll(args.interval, args.iterations):
+            if args.output and articles:
+                with open(args.output, 'a', encoding='utf-8') as f:
+                    for article in articles:
+                        f.write(json.dumps(dict(article, id=article['url'])) + '\n')
+            print(f"{len(articles)} novel articles; index: {ingestor.index.stats()}")
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
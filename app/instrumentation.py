@@ -0,0 +1,356 @@
+# app/instrumentation.py
+"""
+Timing spans, counters and events for the analysis hot paths.
+
+Every span (a stage or a sub-step such as tokenize, forward, generate, parse
+or network) is aggregated into per-name count/sum/max summaries that can be
+rendered in Prometheus text format. Spans opened inside a trace() are also
+recorded on the trace, giving a per-article timing breakdown. Each span and
+event is passed to the registered sinks, e.g. a JSON log.
+
+Environment:
+    NEWS_METRICS_LOG=path         append every span and event as a JSON line ('-' for stderr)
+    NEWS_PROFILE=1                profile every trace with cProfile
+    NEWS_PROFILE_SAMPLE=0.05      profile a random share of traces instead
+    NEWS_PROFILE_DIR=path         where profiles are written (default .cache/profiles)
+"""
+import contextvars
+import cProfile
+import json
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+METRICS_LOG_ENV = 'NEWS_METRICS_LOG'
+PROFILE_ENV = 'NEWS_PROFILE'
+PROFILE_SAMPLE_ENV = 'NEWS_PROFILE_SAMPLE'
+DEFAULT_PROFILE_DIR = os.environ.get('NEWS_PROFILE_DIR', os.path.join('.cache', 'profiles'))
+# Prefix of every exported Prometheus metric name
+METRIC_PREFIX = 'news_'
+
+_current_trace = contextvars.ContextVar('news_trace', default=None)
+_span_depth = contextvars.ContextVar('news_span_depth', default=0)
+# cProfile only sees the thread that enabled it, so each thread profiles its own outermost span
+_thread_state = threading.local()
+
+
+class JsonLogSink:
+    """Writes each record as one JSON line to a file path or an open stream."""
+
+    def __init__(self, target):
+        self._lock = threading.Lock()
+        if hasattr(target, 'write'):
+            self._stream = target
+        else:
+            if os.path.dirname(target):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+            self._stream = open(target, 'a', buffering=1)
+
+    def __call__(self, record):
+        line = json.dumps(record, default=str)
+        with self._lock:
+            self._stream.write(line + '\n')
+
+
+class Metrics:
+    """
+    Thread-safe counters and summaries plus the sinks records are sent to.
+
+    Sinks are callables receiving one dictionary per span or event.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._summaries = {}
+        self.sinks = []
+
+    def add_sink(self, sink):
+        with self._lock:
+            self.sinks.append(sink)
+        return sink
+
+    def remove_sink(self, sink):
+        with self._lock:
+            if sink in self.sinks:
+                self.sinks.remove(sink)
+
+    def increment(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                self._summaries[key] = [1, value, value]
+            else:
+                summary[0] += 1
+                summary[1] += value
+                summary[2] = max(summary[2], value)
+
+    def emit(self, record):
+        for sink in list(self.sinks):
+            try:
+                sink(record)
+            except Exception as e:
+                print(f"Error in metrics sink: {e}")
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._summaries.clear()
+
+    def snapshot(self):
+        """
+        Current values.
+
+        Returns:
+        - Dictionary with 'counters' and 'summaries' lists; every entry holds
+          the metric name, its labels and its value (count/sum/max for summaries).
+        """
+        with self._lock:
+            return {
+                'counters': [
+                    {'name': name, 'labels': dict(labels), 'value': value}
+                    for (name, labels), value in sorted(self._counters.items())
+                ],
+                'summaries': [
+                    {'name': name, 'labels': dict(labels), 'count': count, 'sum': total, 'max': maximum}
+                    for (name, labels), (count, total, maximum) in sorted(self._summaries.items())
+                ],
+            }
+
+    def prometheus_text(self):
+        """Renders all metrics in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = []
+        typed = set()
+        for entry in snapshot['counters']:
+            name = f"{METRIC_PREFIX}{entry['name']}_total"
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{_prometheus_labels(entry['labels'])} {entry['value']}")
+        for entry in snapshot['summaries']:
+            name = f"{METRIC_PREFIX}{entry['name']}"
+            labels = _prometheus_labels(entry['labels'])
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} summary")
+            lines.append(f"{name}_count{labels} {entry['count']}")
+            lines.append(f"{name}_sum{labels} {entry['sum']}")
+        return '\n'.join(lines) + '\n'
+
+
+def _prometheus_labels(labels):
+    if not labels:
+        return ''
+    pairs = []
+    for key, value in sorted(labels.items()):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{key}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+class Trace:
+    """
+    Spans recorded while handling one request (e.g. one article).
+
+    Attributes:
+    - spans: List of dictionaries with name, labels, start (seconds since the
+      trace began), seconds, depth and error, in the order they finished.
+    - profile_path: Path of the cProfile output when profiling was enabled.
+    """
+
+    def __init__(self, name, profile=False):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.profile = profile
+        self.profile_path = None
+        self.spans = []
+        self.started = time.perf_counter()
+        self.seconds = None
+        self._profiles = []
+        self._lock = threading.Lock()
+
+    def add_span(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def breakdown(self):
+        """Spans ordered by start time."""
+        with self._lock:
+            return sorted(self.spans, key=lambda span: span['start'])
+
+    def _add_profile(self, profiler):
+        with self._lock:
+            self._profiles.append(profiler)
+
+    def _write_profile(self, directory):
+        with self._lock:
+            profiles = list(self._profiles)
+        if not profiles:
+            return None
+        stats = pstats.Stats(profiles[0])
+        for profiler in profiles[1:]:
+            stats.add(profiler)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.name}-{self.id}.prof")
+        stats.dump_stats(path)
+        return path
+
+
+def _should_profile():
+    if os.environ.get(PROFILE_ENV, '0') not in ('', '0'):
+        return True
+    sample = float(os.environ.get(PROFILE_SAMPLE_ENV, '0') or 0)
+    return sample > 0 and random.random() < sample
+
+
+def _start_thread_profiler(current_trace):
+    """Profiles the calling thread for `current_trace` unless it is already being profiled."""
+    if current_trace is None or not current_trace.profile or getattr(_thread_state, 'profiling', False):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiler is active (Python 3.12+ allows only one at a time)
+        return None
+    _thread_state.profiling = True
+    return profiler
+
+
+def _stop_thread_profiler(profiler, current_trace):
+    if profiler is not None:
+        profiler.disable()
+        _thread_state.profiling = False
+        current_trace._add_profile(profiler)
+
+
+metrics = Metrics()
+
+if os.environ.get(METRICS_LOG_ENV):
+    _log_target = os.environ[METRICS_LOG_ENV]
+    metrics.add_sink(JsonLogSink(sys.stderr if _log_target == '-' else _log_target))
+
+
+@contextmanager
+def span(name, **labels):
+    """
+    Times a block of code.
+
+    The duration is added to the 'span_seconds' summary (labelled with the
+    span name and `labels`), recorded on the current trace and sent to the sinks.
+    Every distinct label set is its own metric series, so labels must take few
+    values (model or stage names); record sizes and counts with observe().
+
+    Example:
+        with span('generate', model='summarizer'):
+            outputs = summarizer(texts)
+    """
+    current_trace = _current_trace.get()
+    depth = _span_depth.get()
+    depth_token = _span_depth.set(depth + 1)
+    profiler = _start_thread_profiler(current_trace)
+    error = None
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        _stop_thread_profiler(profiler, current_trace)
+        _span_depth.reset(depth_token)
+        metrics.observe('span_seconds', seconds, span=name, **labels)
+        if error is not None:
+            metrics.increment('span_errors', span=name, **labels)
+        record = {'type': 'span', 'name': name, 'labels': labels, 'seconds': seconds, 'error': error}
+        if current_trace is not None:
+            record['trace'] = current_trace.id
+            current_trace.add_span(dict(record, start=start - current_trace.started, depth=depth))
+        if metrics.sinks:
+            metrics.emit(dict(record, timestamp=time.time()))
+
+
+@contextmanager
+def trace(name='request', profile=None):
+    """
+    Collects the spans of one request, including spans in threads started
+    through run_in_context().
+
+    Parameters:
+    - name: Label of the trace, used in profile file names.
+    - profile: Profile the request with cProfile; None follows NEWS_PROFILE
+      and NEWS_PROFILE_SAMPLE. The merged profile is written to
+      DEFAULT_PROFILE_DIR and its path stored on the trace.
+
+    Yields:
+    - The Trace.
+    """
+    current_trace = Trace(name, profile=_should_profile() if profile is None else profile)
+    token = _current_trace.set(current_trace)
+    profiler = _start_thread_profiler(current_trace)
+    try:
+        yield current_trace
+    finally:
+        _stop_thread_profiler(profiler, current_trace)
+        _current_trace.reset(token)
+        current_trace.seconds = time.perf_counter() - current_trace.started
+        if current_trace.profile:
+            current_trace.profile_path = current_trace._write_profile(DEFAULT_PROFILE_DIR)
+        if metrics.sinks:
+            metrics.emit({'type': 'trace', 'name': name, 'trace': current_trace.id,
+                          'seconds': current_trace.seconds, 'profile': current_trace.profile_path,
+                          'timestamp': time.time()})
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def run_in_context(func, *args, **kwargs):
+    """
+    Binds `func` to a copy of the caller's context, so spans it opens in
+    another thread are still recorded on the caller's trace.
+
+    Example:
+        executor.submit(run_in_context(work, item))
+    """
+    context = contextvars.copy_context()
+    return lambda: context.run(func, *args, **kwargs)
+
+
+def increment(name, value=1, **labels):
+    """Adds `value` to a counter, e.g. increment('tokens', 512, model='sentiment')."""
+    metrics.increment(name, value, **labels)
+
+
+def observe(name, value, **labels):
+    """Records one observation of a summary, e.g. observe('batch_size', 16, model='sentiment')."""
+    metrics.observe(name, value, **labels)
+
+
+def event(name, **fields):
+    """Counts an event and sends it to the sinks, e.g. event('model_load', model='summarizer')."""
+    metrics.increment('events', event=name)
+    if metrics.sinks:
+        metrics.emit({'type': 'event', 'name': name, 'fields': fields, 'timestamp': time.time()})
+
+
+def add_sink(sink):
+    return metrics.add_sink(sink)
+
+
+def prometheus_text():
+    return metrics.prometheus_text()
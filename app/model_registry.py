@@ -0,0 +1,317 @@
+# app/model_registry.py
+import hashlib
+import importlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from .instrumentation import event, observe
+
+# Optional memory budget (in MB) for all resident models, e.g. NEWS_MODEL_MEMORY_BUDGET_MB=4096
+MEMORY_BUDGET_ENV = 'NEWS_MODEL_MEMORY_BUDGET_MB'
+
+# Attributes of optimum ORTModels holding the ONNX files they were loaded from
+_ONNX_PATH_ATTRIBUTES = ('model_path', 'encoder_model_path', 'decoder_model_path', 'decoder_with_past_model_path')
+
+# Module that registers each model, imported on demand so a model can be requested
+# (or warmed) by name before its stage module has been imported
+MODEL_PROVIDERS = {
+    'category_classifier': 'app.category_classification',
+    'linear_classifier': 'app.cascade',
+    'multitask': 'app.multitask',
+    'sentiment': 'app.sentiment_analysis',
+    'summarizer': 'app.summarization',
+    'sentencizer': 'app.summarization',
+    'spacy_lg': 'app.ner_extraction',
+    'stanza': 'app.ner_extraction',
+}
+
+
+def _current_rss_bytes():
+    """Resident set size of this process in bytes, or None if it cannot be read."""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def _state_nbytes(value, seen):
+    # Packed quantized weights are stored in the state dict as (weight, bias) tuples
+    if isinstance(value, (tuple, list)):
+        return sum(_state_nbytes(item, seen) for item in value)
+    if not hasattr(value, 'element_size'):
+        return 0
+    # Tied weights are counted once
+    if value.data_ptr() in seen:
+        return 0
+    seen.add(value.data_ptr())
+    return value.numel() * value.element_size()
+
+
+def _onnx_nbytes(model):
+    """Size of the ONNX files an optimum ORTModel was loaded from, or None."""
+    paths = {str(getattr(model, attribute)) for attribute in _ONNX_PATH_ATTRIBUTES if getattr(model, attribute, None)}
+    files = [path for path in paths if os.path.isfile(path)]
+    # Weights over 2GB are stored next to the graph as external data
+    files += [path + suffix for path in files for suffix in ('_data', '.data') if os.path.isfile(path + suffix)]
+    return sum(os.path.getsize(path) for path in files) or None
+
+
+def _spacy_nbytes(nlp):
+    total = nlp.vocab.vectors.data.nbytes
+    for _, component in nlp.pipeline:
+        model = getattr(component, 'model', None)
+        if hasattr(model, 'walk'):
+            for node in model.walk():
+                total += sum(node.get_param(name).nbytes for name in node.param_names if node.has_param(name))
+    return total
+
+
+def _tensor_nbytes(obj):
+    """
+    Size of the weights held by a model object in bytes.
+
+    Handles torch modules (including dynamically quantized ones), transformers
+    pipelines (through their `.model`), optimum ONNX Runtime models (by the
+    size of their ONNX files), spaCy pipelines, Stanza pipelines and tuples
+    such as (tokenizer, model). Returns None for anything else.
+    """
+    if isinstance(obj, (tuple, list)):
+        sizes = [_tensor_nbytes(item) for item in obj]
+        sizes = [size for size in sizes if size is not None]
+        return sum(sizes) if sizes else None
+    if isinstance(getattr(obj, 'processors', None), dict):
+        # Stanza: each processor keeps its torch model on a trainer or directly
+        return _tensor_nbytes([getattr(processor, attribute, None) for processor in obj.processors.values()
+                               for attribute in ('_trainer', '_model')])
+    if hasattr(obj, 'pipeline') and hasattr(obj, 'vocab'):
+        return _spacy_nbytes(obj)
+
+    model = getattr(obj, 'model', obj)
+    if hasattr(model, 'state_dict') and hasattr(model, 'parameters'):
+        seen = set()
+        return sum(_state_nbytes(value, seen) for value in model.state_dict().values())
+    # An ORTModel's own `.model` is its InferenceSession
+    return _onnx_nbytes(obj) or _onnx_nbytes(model)
+
+
+def artifact_version(path):
+    """
+    Version callable for a model loaded from local files.
+
+    The version combines `path` with the size and modification time of every
+    file under it, so retraining into the same path gives a new version. A path
+    that does not exist (yet) versions as the path alone.
+    """
+    def version():
+        if os.path.isfile(path):
+            files = [path]
+        else:
+            files = sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+        if not files:
+            return path
+        digest = hashlib.sha256()
+        for file in files:
+            stat = os.stat(file)
+            digest.update(f"{os.path.relpath(file, path)}:{stat.st_size}:{stat.st_mtime_ns};".encode('utf-8'))
+        return f"{path}@{digest.hexdigest()[:12]}"
+    return version
+
+
+class ModelRegistry:
+    """
+    Process-wide, lazily populated store of loaded models.
+
+    Each model is registered once with a loader callable and is only loaded
+    the first time it is requested. Loads are guarded by a per-model lock so
+    concurrent threads share a single copy. When a memory budget is set, the
+    least recently used models are evicted to stay under it.
+    """
+
+    def __init__(self, memory_budget_mb=None):
+        self._loaders = {}
+        self._versions = {}
+        self._models = OrderedDict()
+        self._stats = {}
+        self._lock = threading.RLock()
+        self._load_locks = {}
+        self.memory_budget_bytes = int(memory_budget_mb * 1024 * 1024) if memory_budget_mb else None
+
+    def register(self, name, loader, version=None):
+        """
+        Register a loader for a model name.
+
+        Parameters:
+        - name: Key used to request the model.
+        - loader: Zero-argument callable returning the loaded model.
+        - version: Optional identifier of the underlying weights (path, hub id,
+          revision), or a zero-argument callable returning one (see artifact_version).
+        """
+        with self._lock:
+            self._loaders[name] = loader
+            self._versions[name] = version or name
+            self._load_locks.setdefault(name, threading.Lock())
+
+    def is_registered(self, name):
+        return name in self._loaders
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def version(self, name):
+        version = self._versions.get(name)
+        return version() if callable(version) else version
+
+    def get(self, name):
+        """Return the model registered under `name`, loading it on first use."""
+        with self._lock:
+            if name in self._models:
+                self._models.move_to_end(name)
+                self._stats[name]['hits'] += 1
+                return self._models[name]
+        # Backend variants ('summarizer:onnx') are registered by the same module as their base model
+        provider = MODEL_PROVIDERS.get(name.split(':')[0])
+        if name not in self._loaders and provider:
+            importlib.import_module(provider)
+        with self._lock:
+            if name not in self._loaders:
+                raise KeyError(f"No model registered under '{name}'")
+            load_lock = self._load_locks[name]
+
+        with load_lock:
+            # Another thread may have finished loading while we waited
+            with self._lock:
+                if name in self._models:
+                    self._models.move_to_end(name)
+                    self._stats[name]['hits'] += 1
+                    return self._models[name]
+
+            rss_before = _current_rss_bytes()
+            start = time.perf_counter()
+            model = self._loaders[name]()
+            load_seconds = time.perf_counter() - start
+            rss_after = _current_rss_bytes()
+
+            # The budget counts weights only. RSS growth during the load also includes
+            # first-time library imports and whatever other threads allocated meanwhile,
+            # so it is only reported as a diagnostic.
+            nbytes = _tensor_nbytes(model)
+            rss_delta = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+
+            with self._lock:
+                previous = self._stats.get(name, {})
+                self._models[name] = model
+                self._stats[name] = {
+                    'version': self.version(name),
+                    'load_seconds': load_seconds,
+                    'memory_bytes': nbytes or 0,
+                    'load_rss_delta_bytes': rss_delta,
+                    'loads': previous.get('loads', 0) + 1,
+                    'hits': previous.get('hits', 0),
+                    'evictions': previous.get('evictions', 0),
+                }
+                self._enforce_budget(keep=name)
+            observe('model_load_seconds', load_seconds, model=name)
+            event('model_load', model=name, version=self.version(name), seconds=load_seconds,
+                  memory_bytes=nbytes or 0)
+            return model
+
+    def warm(self, names, background=True):
+        """
+        Load models ahead of their first request.
+
+        Parameters:
+        - names: Model names to load.
+        - background: Load in a daemon thread and return it instead of blocking.
+        """
+        def load_all():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    print(f"Error warming model '{name}': {e}")
+
+        if not background:
+            load_all()
+            return None
+        thread = threading.Thread(target=load_all, name='model-warmup', daemon=True)
+        thread.start()
+        return thread
+
+    def evict(self, name):
+        """Drop a loaded model so its memory can be reclaimed."""
+        with self._lock:
+            if self._models.pop(name, None) is not None:
+                self._stats[name]['evictions'] += 1
+                event('model_evict', model=name)
+                return True
+            return False
+
+    def clear(self):
+        with self._lock:
+            for name in list(self._models):
+                self.evict(name)
+
+    def set_memory_budget(self, memory_budget_mb):
+        with self._lock:
+            self.memory_budget_bytes = int(memory_budget_mb * 1024 * 1024) if memory_budget_mb else None
+            self._enforce_budget()
+
+    def resident_bytes(self):
+        with self._lock:
+            return sum(self._stats[name]['memory_bytes'] for name in self._models)
+
+    def _enforce_budget(self, keep=None):
+        if self.memory_budget_bytes is None:
+            return
+        # Evict least recently used models first, never the one just requested
+        for name in list(self._models):
+            if self.resident_bytes() <= self.memory_budget_bytes:
+                break
+            if name != keep:
+                self.evict(name)
+
+    def stats(self):
+        """
+        Per-model statistics.
+
+        Returns:
+        - Dictionary mapping model name to its version, load time, weight size
+          ('memory_bytes', used for the budget), RSS growth during its last load
+          (a diagnostic that includes library imports and concurrent allocations),
+          load/hit/eviction counts and whether it is loaded.
+        """
+        with self._lock:
+            report = {}
+            for name in self._loaders:
+                entry = dict(self._stats.get(name, {
+                    'version': self.version(name),
+                    'load_seconds': None,
+                    'memory_bytes': 0,
+                    'load_rss_delta_bytes': None,
+                    'loads': 0,
+                    'hits': 0,
+                    'evictions': 0,
+                }))
+                entry['loaded'] = name in self._models
+                report[name] = entry
+            return report
+
+
+_budget = os.environ.get(MEMORY_BUDGET_ENV)
+registry = ModelRegistry(memory_budget_mb=float(_budget) if _budget else None)
+
+
+def register_model(name, loader, version=None):
+    registry.register(name, loader, version=version)
+
+
+def get_model(name):
+    return registry.get(name)
+
+
+def warm_models(names, background=True):
+    return registry.warm(names, background=background)
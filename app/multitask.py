@@ -0,0 +1,252 @@
+# app/multitask.py
+"""
+Shared-encoder model: one RoBERTa encoder with a category head and a sentiment
+head, so each article is tokenized and encoded once for both labels.
+
+Usage:
+    python -m app.category_classification --multitask     # train (sentiment distilled from the existing model)
+    python -m app.multitask report --limit 500              # agreement, latency and memory vs. the separate models
+
+The sentiment head is trained by distillation: the existing sentiment model's
+predictions on the training texts are the soft targets. With NEWS_MULTITASK=1
+the app and batch pipeline get category and sentiment from the shared model.
+"""
+import argparse
+import json
+import os
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import torch
+
+from .model_registry import artifact_version, register_model, get_model, registry
+from .batching import batched_class_probabilities, batched_head_probabilities
+from .result_cache import cached_batch_stage, result_cache_disabled
+
+MULTITASK_MODEL_DIR = os.path.join('models', 'multitask_model')
+HEADS_FILE = 'heads.pt'
+
+
+class _ClassificationHead(torch.nn.Module):
+    """Same layout as RobertaClassificationHead, applied to the <s> token."""
+
+    def __init__(self, hidden_size, num_labels, dropout):
+        super().__init__()
+        self.dropout = torch.nn.Dropout(dropout)
+        self.dense = torch.nn.Linear(hidden_size, hidden_size)
+        self.out_proj = torch.nn.Linear(hidden_size, num_labels)
+
+    def forward(self, features):
+        x = self.dropout(features)
+        x = torch.tanh(self.dense(x))
+        return self.out_proj(self.dropout(x))
+
+
+class MultiTaskRoberta(torch.nn.Module):
+    """
+    RoBERTa encoder with category and sentiment heads.
+
+    When training, `labels` gives the category loss (cross-entropy) and
+    `sentiment_targets` (teacher probabilities) the distillation loss:
+    KL divergence at `temperature`, scaled by temperature**2 and `distill_weight`.
+    """
+
+    def __init__(self, encoder, num_categories=4, num_sentiments=3, distill_weight=1.0, temperature=2.0):
+        super().__init__()
+        hidden_size = encoder.config.hidden_size
+        dropout = encoder.config.hidden_dropout_prob
+        self.encoder = encoder
+        self.category_head = _ClassificationHead(hidden_size, num_categories, dropout)
+        self.sentiment_head = _ClassificationHead(hidden_size, num_sentiments, dropout)
+        self.distill_weight = distill_weight
+        self.temperature = temperature
+
+    @classmethod
+    def from_encoder(cls, name='roberta-base', **kwargs):
+        from transformers import RobertaModel
+
+        return cls(RobertaModel.from_pretrained(name, add_pooling_layer=False), **kwargs)
+
+    def forward(self, input_ids, attention_mask=None, labels=None, sentiment_targets=None, **_):
+        hidden = self.encoder(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state[:, 0]
+        category_logits = self.category_head(hidden)
+        sentiment_logits = self.sentiment_head(hidden)
+
+        loss = None
+        if labels is not None:
+            loss = torch.nn.functional.cross_entropy(category_logits, labels)
+        if sentiment_targets is not None:
+            # Teacher probabilities re-softened at the distillation temperature
+            teacher = torch.softmax(torch.log(sentiment_targets.clamp_min(1e-8)) / self.temperature, dim=-1)
+            student = torch.log_softmax(sentiment_logits / self.temperature, dim=-1)
+            distill = torch.nn.functional.kl_div(student, teacher, reduction='batchmean') * self.temperature ** 2
+            loss = self.distill_weight * distill if loss is None else loss + self.distill_weight * distill
+        return SimpleNamespace(loss=loss, category_logits=category_logits, sentiment_logits=sentiment_logits)
+
+    def save_pretrained(self, path):
+        self.encoder.save_pretrained(path)
+        torch.save({
+            'category_head': self.category_head.state_dict(),
+            'sentiment_head': self.sentiment_head.state_dict(),
+            'num_categories': self.category_head.out_proj.out_features,
+            'num_sentiments': self.sentiment_head.out_proj.out_features,
+        }, os.path.join(path, HEADS_FILE))
+
+    @classmethod
+    def from_pretrained(cls, path):
+        from transformers import RobertaModel
+
+        heads = torch.load(os.path.join(path, HEADS_FILE), map_location='cpu')
+        model = cls(RobertaModel.from_pretrained(path, add_pooling_layer=False),
+                    heads['num_categories'], heads['num_sentiments'])
+        model.category_head.load_state_dict(heads['category_head'])
+        model.sentiment_head.load_state_dict(heads['sentiment_head'])
+        return model
+
+
+def _load_multitask():
+    from transformers import RobertaTokenizer
+
+    tokenizer = RobertaTokenizer.from_pretrained(MULTITASK_MODEL_DIR)
+    model = MultiTaskRoberta.from_pretrained(MULTITASK_MODEL_DIR)
+    model.eval()
+    return tokenizer, model
+
+register_model('multitask', _load_multitask, version=artifact_version(MULTITASK_MODEL_DIR))
+
+
+def sentiment_teacher_targets(df, prefix, text_column='description', batch_size=32, max_length=512):
+    """
+    The existing sentiment model's probabilities for every row of `df`.
+
+    Stored as <prefix>.sentiment.npy next to the tokenized data (see
+    training_data.preprocess_dataset) and reused while that data is unchanged.
+    """
+    with open(prefix + '.json') as f:
+        fingerprint = json.load(f)['fingerprint']
+    targets_path, meta_path = prefix + '.sentiment.npy', prefix + '.sentiment.json'
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            if json.load(f).get('fingerprint') == fingerprint:
+                return np.load(targets_path)
+
+    teacher = get_model('sentiment')
+    texts = df[text_column].astype(str).tolist()
+    probabilities = []
+    for start in range(0, len(texts), 10000):
+        probabilities.extend(batched_class_probabilities(
+            teacher.tokenizer, teacher.model, texts[start:start + 10000], batch_size, max_length, name='sentiment'
+        ))
+        print(f"Computed sentiment targets for {len(probabilities)}/{len(texts)} examples")
+    targets = np.asarray(probabilities, dtype=np.float32)
+    np.save(targets_path, targets)
+    with open(meta_path, 'w') as f:
+        json.dump({'fingerprint': fingerprint}, f)
+    return targets
+
+
+@cached_batch_stage('category_sentiment', models=('multitask',), ignore=('batch_size',))
+def classify_and_analyze_sentiment_batch(texts, batch_size=16, max_length=512):
+    """
+    Category and sentiment of many texts from a single encode per text.
+
+    Returns:
+    - List of dictionaries with 'category' and 'sentiment' entries, each shaped
+      like the results of classify_news_batch and sentiment_analysis_batch.
+    """
+    from .category_classification import LABEL_MAP
+    from .sentiment_analysis import SENTIMENT_LABELS
+
+    tokenizer, model = get_model('multitask')
+    probabilities = batched_head_probabilities(
+        tokenizer, model, texts, ('category_logits', 'sentiment_logits'), batch_size, max_length, name='multitask'
+    )
+
+    def labelled(probs, labels):
+        predicted = max(range(len(probs)), key=probs.__getitem__)
+        return {'label': labels[predicted], 'score': probs[predicted], 'probabilities': dict(zip(labels, probs))}
+
+    category_labels = [LABEL_MAP[i] for i in range(len(LABEL_MAP))]
+    return [
+        {'category': labelled(category, category_labels), 'sentiment': labelled(sentiment, SENTIMENT_LABELS)}
+        for category, sentiment in zip(probabilities['category_logits'], probabilities['sentiment_logits'])
+    ]
+
+
+# Measure real inference, never cached results
+@result_cache_disabled()
+def compare_with_separate_models(limit=500, batch_size=16):
+    """
+    Runs the shared model and the two separate models on models/test.csv.
+
+    Returns:
+    - Dictionary with category accuracy for both, agreement of each label with
+      the separate models, end-to-end latency (ms per text) and the estimated
+      resident memory of each setup.
+    """
+    from .category_classification import LABEL_MAP, load_data, classify_news_batch
+    from .sentiment_analysis import sentiment_analysis_batch
+
+    _, test_df = load_data()
+    if limit:
+        test_df = test_df.head(limit)
+    texts = test_df['description'].astype(str).tolist()
+    expected = [LABEL_MAP[c] for c in test_df['class_id']]
+    for name in ('multitask', 'category_classifier', 'sentiment'):
+        get_model(name)
+
+    start = time.perf_counter()
+    categories = classify_news_batch(texts, batch_size=batch_size)
+    sentiments = sentiment_analysis_batch(texts, batch_size=batch_size)
+    separate_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    shared = classify_and_analyze_sentiment_batch(texts, batch_size=batch_size)
+    shared_seconds = time.perf_counter() - start
+
+    def share(pairs):
+        pairs = list(pairs)
+        return sum(a == b for a, b in pairs) / len(pairs)
+
+    stats = registry.stats()
+    return {
+        'texts': len(texts),
+        'category_accuracy': {
+            'separate': share(zip((r['label'] for r in categories), expected)),
+            'shared': share(zip((r['category']['label'] for r in shared), expected)),
+        },
+        'category_agreement': share(zip((r['label'] for r in categories), (r['category']['label'] for r in shared))),
+        'sentiment_agreement': share(zip((r['label'] for r in sentiments), (r['sentiment']['label'] for r in shared))),
+        'ms_per_text': {
+            'separate': separate_seconds * 1000 / len(texts),
+            'shared': shared_seconds * 1000 / len(texts),
+        },
+        'memory_mb': {
+            'separate': (stats['category_classifier']['memory_bytes'] + stats['sentiment']['memory_bytes']) / 2 ** 20,
+            'shared': stats['multitask']['memory_bytes'] / 2 ** 20,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    report_parser = commands.add_parser('report')
+    report_parser.add_argument('--limit', type=int, default=500)
+    report_parser.add_argument('--batch-size', type=int, default=16)
+    args = parser.parse_args()
+
+    report = compare_with_separate_models(args.limit, args.batch_size)
+    print(f"Texts: {report['texts']}")
+    print(f"Category accuracy: separate {report['category_accuracy']['separate']:.3f}, "
+          f"shared {report['category_accuracy']['shared']:.3f}")
+    print(f"Agreement with separate models: category {report['category_agreement']:.1%}, "
+          f"sentiment {report['sentiment_agreement']:.1%}")
+    print(f"Latency: separate {report['ms_per_text']['separate']:.2f} ms/text, "
+          f"shared {report['ms_per_text']['shared']:.2f} ms/text")
+    print(f"Memory: separate {report['memory_mb']['separate']:.0f} MB, shared {report['memory_mb']['shared']:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,99 +1,215 @@
 # app/ner_extraction.py
-import spacy
+import os
 from itertools import combinations
-import stanza
+import numpy as np
+from scipy import sparse
+from .model_registry import register_model, get_model
+from .result_cache import Uncached, cached_stage, cached_batch_stage
+from .instrumentation import span
 
-# Load Stanza and spaCy models
-nlp_stanza = stanza.Pipeline('en', processors='tokenize,mwt,pos,lemma,ner,depparse,coref')
-nlp_spacy = spacy.load("en_core_web_lg")
+# Stanza and spaCy models, loaded on first use through the shared registry.
+# Coreference only needs tokens; POS tags let the coref processor prefer proper
+# nouns when choosing each chain's representative mention.
+STANZA_PROCESSORS = 'tokenize,mwt,pos,coref'
+
+def _load_stanza():
+    import stanza
+
+    return stanza.Pipeline('en', processors=STANZA_PROCESSORS)
+
+def _load_spacy_lg():
+    import spacy
+
+    return spacy.load("en_core_web_lg")
+
+register_model('stanza', _load_stanza, version=f"stanza-en:{STANZA_PROCESSORS}")
+register_model('spacy_lg', _load_spacy_lg, version='en_core_web_lg')
+
+# Components the character analysis never reads (it needs ner, parser and POS tags only)
+NER_UNUSED_COMPONENTS = ['lemmatizer']
+
+def _unused_components(nlp_spacy):
+    return [name for name in NER_UNUSED_COMPONENTS if name in nlp_spacy.pipe_names]
+
+def parse_story(text):
+    """Parse text once with spaCy; already parsed Docs are returned unchanged."""
+    if not isinstance(text, str):
+        return text
+    nlp_spacy = get_model('spacy_lg')
+    # Disabled per call: select_pipes() would change the pipeline shared by every thread
+    with span('parse', model='spacy_lg'):
+        return nlp_spacy(text, disable=_unused_components(nlp_spacy))
 
 # Coreference Resolution using Stanza
+# Resolve pronouns and other mentions to their chain's representative before the
+# character analysis (NEWS_NER_COREF=0 turns it off)
+NER_COREF_ENABLED = os.environ.get('NEWS_NER_COREF', '1') == '1'
+# Mentions replaced by "<representative>'s"
+POSSESSIVE_PRONOUNS = {'his', 'its', 'their', 'hers', 'theirs'}
+# Reason Stanza failed to load; set once, so later calls skip coreference instead of retrying the load
+_coref_unavailable = None
+
+def _stanza_for_coref():
+    """The Stanza pipeline, or None (logged once per process) if it cannot be loaded."""
+    global _coref_unavailable
+    if _coref_unavailable is None:
+        try:
+            return get_model('stanza')
+        except Exception as e:
+            _coref_unavailable = f"{type(e).__name__}: {e}"
+            print(f"Coreference resolution disabled, Stanza is unavailable: {_coref_unavailable}")
+    return None
+
+def coref_available():
+    """False once Stanza has failed to load in this process."""
+    return _coref_unavailable is None
+
 def get_coref_resolutions(text):
+    nlp_stanza = get_model('stanza')
     doc = nlp_stanza(text)
     coref_chains = doc.coref
     return doc, coref_chains
 
-def resolve_coreferences(text):
-    doc, coref_chains = get_coref_resolutions(text)
-    resolved_text = text
-    
-    # Dictionary to replace mentions with their representative text
-    mention_to_replacement = {}
-    
-    for chain in coref_chains:
-        representative_text = chain.representative_text
-        for mention in chain.mentions:
-            sentence_idx = mention.sentence
-            sentence = doc.sentences[sentence_idx]
-            start_word = mention.start_word
-            end_word = mention.end_word
-            
-            # Join words from start_word to end_word
-            try:
-                mention_text = ' '.join(sentence.text.split()[start_word:end_word])
-                mention_to_replacement[mention_text] = representative_text
-            except IndexError:
+def _word_span(word):
+    if word.start_char is None or word.end_char is None:
+        # Words inside a multi-word token carry their token's offsets
+        return word.parent.start_char, word.parent.end_char
+    return word.start_char, word.end_char
+
+def coref_replacements(doc):
+    """
+    Character-offset replacements for a Stanza Document with coref chains.
+
+    Every mention except its chain's representative is replaced by the
+    representative text. Nested or overlapping mentions keep the outermost,
+    earliest one.
+
+    Returns:
+    - List of (start_char, end_char, replacement) tuples sorted by position.
+    """
+    text = doc.text
+    candidates = []
+    for chain in doc.coref or []:
+        for index, mention in enumerate(chain.mentions):
+            if index == chain.representative_index:
                 continue
-    
-    # Replace mentions with their representative text
-    for mention, replacement in mention_to_replacement.items():
-        resolved_text = resolved_text.replace(mention, replacement)
-    return resolved_text
+            words = doc.sentences[mention.sentence].words[mention.start_word:mention.end_word]
+            if not words:
+                continue
+            start, end = _word_span(words[0])[0], _word_span(words[-1])[1]
+            mention_text = text[start:end]
+            replacement = chain.representative_text
+            if mention_text == replacement:
+                continue
+            if mention_text.lower() in POSSESSIVE_PRONOUNS and not replacement.endswith("'s"):
+                replacement += "'s"
+            if mention_text[:1].isupper() and replacement[:1].islower():
+                replacement = replacement[0].upper() + replacement[1:]
+            candidates.append((start, end, replacement))
 
-# Extract Character Names
-def list_all_characters(text):
-    doc = nlp_spacy(text)
-    characters = set()
-    for ent in doc.ents:
-        if ent.label_ == "PERSON":
-            characters.add(ent.text)
-    return list(characters)
+    replacements = []
+    last_end = 0
+    for start, end, replacement in sorted(candidates, key=lambda item: (item[0], -item[1])):
+        if start >= last_end:
+            replacements.append((start, end, replacement))
+            last_end = end
+    return replacements
 
-# Identify the Protagonist
-def find_protagonist_with_context(text):
-    doc = nlp_spacy(text)
-    
-    character_mentions = {}
-    character_subject_counts = {}
+def apply_replacements(text, replacements):
+    """Applies sorted, non-overlapping (start, end, replacement) edits in one left-to-right pass."""
+    parts = [None] * (2 * len(replacements) + 1)
+    position = 0
+    for i, (start, end, replacement) in enumerate(replacements):
+        parts[2 * i] = text[position:start]
+        parts[2 * i + 1] = replacement
+        position = end
+    parts[-1] = text[position:]
+    return ''.join(parts)
 
-    for ent in doc.ents:
-        if ent.label_ == "PERSON":
-            character_name = ent.text
-            if character_name not in character_mentions:
-                character_mentions[character_name] = 0
-                character_subject_counts[character_name] = 0
+def resolve_coreferences_batch(texts):
+    """
+    Rewrites every coreferent mention to its representative text.
 
-            character_mentions[character_name] += 1
+    All texts go through Stanza together so tokenization and tagging are batched.
 
-            for token in doc:
-                if token.text == character_name and token.dep_ == "nsubj":
-                    character_subject_counts[character_name] += 1
+    Returns:
+    - List of resolved texts, in input order.
+    """
+    import stanza
 
-    if character_mentions:
-        protagonist = max(character_mentions, key=lambda name: (character_subject_counts[name], character_mentions[name]))
-        return protagonist
-    else:
-        return None
+    texts = [str(text) for text in texts]
+    if not texts:
+        return []
+    nlp_stanza = get_model('stanza')
+    with span('coref', model='stanza'):
+        docs = nlp_stanza([stanza.Document([], text=text) for text in texts])
+    return [apply_replacements(text, coref_replacements(doc)) for text, doc in zip(texts, docs)]
 
-# Extract Character Traits
-def extract_character_traits(text, characters):
-    # Process the text
-    doc = nlp_spacy(text)
-    
-    character_traits = {char: [] for char in characters}
+def resolve_coreferences(text):
+    return resolve_coreferences_batch([text])[0]
+
+def _resolve_for_analysis(texts):
+    """
+    Returns (texts, resolved): the coref-resolved texts and True, or the original
+    texts and False if Stanza is unavailable or fails on them.
+    """
+    texts = [str(text) for text in texts]
+    if _stanza_for_coref() is None:
+        return texts, False
+    try:
+        return resolve_coreferences_batch(texts), True
+    except Exception as e:
+        print(f"Error in coreference resolution: {e}")
+        return texts, False
+
+# Build a single-pass index of PERSON entities, their syntactic roles and per-sentence traits
+def build_entity_index(text):
+    """
+    Index the PERSON entities of a parsed story in one linear pass.
+
+    Parameters:
+    - text: Story text or an already parsed spaCy Doc.
+
+    Returns:
+    - Dictionary with:
+      - 'characters': character names in order of first mention
+      - 'mentions': mention count per character
+      - 'subject_counts': number of nominal subject tokens inside each character's mentions
+      - 'sentences': list of (characters in sentence, noun-adjective pairs) per sentence
+    """
+    doc = parse_story(text)
+    if 'entity_index' in doc.user_data:
+        return doc.user_data['entity_index']
+
+    mentions = {}
+    subject_counts = {}
+    # Token position -> character name, so each token is looked up in O(1)
+    token_to_character = {}
 
-    # Loop through each sentence in the document
+    for ent in doc.ents:
+        if ent.label_ != "PERSON":
+            continue
+        name = ent.text
+        mentions[name] = mentions.get(name, 0) + 1
+        subject_counts.setdefault(name, 0)
+        for i in range(ent.start, ent.end):
+            token_to_character[i] = name
+
+    # Subject counts come straight from the dependency labels of tokens inside mentions
+    for i, name in token_to_character.items():
+        if doc[i].dep_ == "nsubj":
+            subject_counts[name] += 1
+
+    sentences = []
     for sent in doc.sents:
-        sentence_characters = set()
+        sentence_characters = []
         sentence_pairs = []
-
-        # First, find all characters in the sentence
         for token in sent:
-            if token.text in characters:
-                sentence_characters.add(token.text)
+            name = token_to_character.get(token.i)
+            if name is not None and name not in sentence_characters:
+                sentence_characters.append(name)
 
-        # Now, find noun-adjective pairs in the sentence
-        for token in sent:
+            # Noun-adjective pairs in the sentence
             if token.pos_ == "NOUN":
                 for child in token.children:
                     if child.pos_ == "ADJ":
@@ -102,11 +218,46 @@ def extract_character_traits(text, characters):
                         for conj in child.conjuncts:
                             if conj.pos_ == "ADJ":
                                 sentence_pairs.append(f"{conj.text} {token.text}")
+        sentences.append((sentence_characters, sentence_pairs))
+
+    index = {
+        "characters": list(mentions),
+        "mentions": mentions,
+        "subject_counts": subject_counts,
+        "sentences": sentences,
+    }
+    doc.user_data['entity_index'] = index
+    return index
 
-        # Associate each pair with the characters found in the sentence
+# Extract Character Names
+def list_all_characters(text):
+    return list(build_entity_index(text)["characters"])
+
+# Identify the Protagonist
+def find_protagonist_with_context(text):
+    index = build_entity_index(text)
+    character_mentions = index["mentions"]
+    character_subject_counts = index["subject_counts"]
+
+    if character_mentions:
+        protagonist = max(character_mentions, key=lambda name: (character_subject_counts[name], character_mentions[name]))
+        return protagonist
+    else:
+        return None
+
+# Extract Character Traits
+def extract_character_traits(text, characters):
+    # Reuse the entity index of the (already parsed) story
+    index = build_entity_index(text)
+
+    character_traits = {char: [] for char in characters}
+
+    # Associate each sentence's pairs with the characters found in that sentence
+    for sentence_characters, sentence_pairs in index["sentences"]:
         for char in sentence_characters:
-            character_traits[char].extend(sentence_pairs)
-    
+            if char in character_traits:
+                character_traits[char].extend(sentence_pairs)
+
     return character_traits
 
 # Calculate Similarity between Traits
@@ -118,11 +269,8 @@ def calculate_similarity(unique_traits_1, unique_traits_2):
     total = len(unique_traits_1.union(unique_traits_2))
     return overlap / total
 
-# Determine Relationship based on Shared and Unique Traits
-def determine_relationship(shared_traits, unique_traits_1, unique_traits_2):
-    relationship_strength = len(shared_traits)
-    similarity_score = calculate_similarity(unique_traits_1, unique_traits_2)
-    
+# Map relationship strength and similarity to a relationship description
+def _relationship_label(relationship_strength, similarity_score):
     # Adjusted relationship logic
     if relationship_strength > 1 or similarity_score > 0.3:
         return 'A strong, close relationship with deep mutual understanding and support.'
@@ -131,30 +279,107 @@ def determine_relationship(shared_traits, unique_traits_1, unique_traits_2):
     else:
         return 'A distant or strained relationship with little to no connection.'
 
+# Determine Relationship based on Shared and Unique Traits
+def determine_relationship(shared_traits, unique_traits_1, unique_traits_2):
+    relationship_strength = len(shared_traits)
+    similarity_score = calculate_similarity(unique_traits_1, unique_traits_2)
+    return _relationship_label(relationship_strength, similarity_score)
+
+# Encode traits as a sparse character x trait incidence matrix
+def trait_incidence_matrix(character_traits):
+    """
+    Parameters:
+    - character_traits: Dictionary mapping character name to a list of traits.
+
+    Returns:
+    - (characters, matrix) where row i of the binary CSR matrix marks the
+      distinct traits of characters[i].
+    """
+    characters = list(character_traits)
+    trait_ids = {}
+    rows, cols = [], []
+    for row, character in enumerate(characters):
+        for trait in set(character_traits[character]):
+            rows.append(row)
+            cols.append(trait_ids.setdefault(trait, len(trait_ids)))
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.int32), (rows, cols)),
+        shape=(len(characters), len(trait_ids)),
+    )
+    return characters, matrix
+
 # Analyze Relationships between Characters
-def analyze_character_relationships(character_traits):
-    relationships = {}
-    character_pairs = combinations(character_traits.keys(), 2)
-    for character_1, character_2 in character_pairs:
-        traits_1 = set(character_traits[character_1])
-        traits_2 = set(character_traits[character_2])
-        
-        shared_traits = traits_1.intersection(traits_2)
-        unique_traits_1 = traits_1 - traits_2
-        unique_traits_2 = traits_2 - traits_1
-        
-        relationship = determine_relationship(shared_traits, unique_traits_1, unique_traits_2)
-        relationships[(character_1, character_2)] = relationship
-    return relationships
+def analyze_character_relationships(character_traits, top_k=None, min_similarity=None):
+    """
+    Scores every character pair from one sparse matrix product.
 
-# Main Function to Process Story
-def analyze_story(text):
-    # resolved_story = resolve_coreferences(text)
-    # print("resolved story: ", resolved_story)
-    characters = list_all_characters(text)
-    protagonist = find_protagonist_with_context(text)
-    character_traits = extract_character_traits(text, characters)
-    relationships = analyze_character_relationships(character_traits)
+    Parameters:
+    - character_traits: Dictionary mapping character name to a list of traits.
+    - top_k: If set, keep only each character's k most similar partners.
+    - min_similarity: If set, keep only pairs whose trait Jaccard similarity is at least this value.
+
+    Returns:
+    - Dictionary mapping (character_1, character_2) to a relationship description.
+      Without top_k/min_similarity every pair is returned, as before; with them only
+      pairs sharing at least one trait are considered.
+    """
+    characters, incidence = trait_incidence_matrix(character_traits)
+    n = len(characters)
+    if n < 2:
+        return {}
+
+    # shared[i, j] = number of distinct traits characters i and j have in common
+    shared = (incidence @ incidence.T).tocsr()
+    sizes = np.asarray(incidence.sum(axis=1)).ravel()
+
+    # The unique-trait sets of a pair are disjoint by construction, so the similarity
+    # that determine_relationship derives from them is always zero; the label only
+    # depends on the shared-trait count.
+    if top_k is None and min_similarity is None:
+        dense_shared = shared.toarray()
+        return {
+            (characters[i], characters[j]): _relationship_label(int(dense_shared[i, j]), 0)
+            for i, j in combinations(range(n), 2)
+        }
+
+    # Only visit pairs with a non-zero product instead of materialising all n^2 pairs
+    coo = sparse.triu(shared, k=1).tocoo()
+    union = sizes[coo.row] + sizes[coo.col] - coo.data
+    jaccard = np.divide(coo.data, union, out=np.zeros(len(coo.data)), where=union > 0)
+
+    keep = np.ones(len(coo.data), dtype=bool)
+    if min_similarity is not None:
+        keep &= jaccard >= min_similarity
+
+    candidates = [
+        (int(i), int(j), int(count), float(score))
+        for i, j, count, score, kept in zip(coo.row, coo.col, coo.data, jaccard, keep)
+        if kept
+    ]
+
+    if top_k is not None:
+        partners = {}
+        for candidate in candidates:
+            i, j, count, score = candidate
+            partners.setdefault(i, []).append(candidate)
+            partners.setdefault(j, []).append(candidate)
+        selected = set()
+        for ranked in partners.values():
+            ranked.sort(key=lambda c: (c[3], c[2]), reverse=True)
+            selected.update(ranked[:top_k])
+        candidates = sorted(selected)
+
+    return {
+        (characters[i], characters[j]): _relationship_label(count, 0)
+        for i, j, count, _ in candidates
+    }
+
+# Run every sub-stage on one parsed Doc
+def _analyze_doc(doc, **relationship_options):
+    characters = list_all_characters(doc)
+    protagonist = find_protagonist_with_context(doc)
+    character_traits = extract_character_traits(doc, characters)
+    relationships = analyze_character_relationships(character_traits, **relationship_options)
 
     # Returning structured data
     return {
@@ -164,6 +389,56 @@ def analyze_story(text):
         "relationships": relationships
     }
 
+# Main Function to Process Story
+def analyze_story(text, top_k=None, min_similarity=None, coref=NER_COREF_ENABLED):
+    # Once Stanza is known to be unavailable the result is cached as what it is: without coreference
+    return _analyze_story(text, top_k, min_similarity, coref and coref_available())
+
+@cached_stage('ner', models=('spacy_lg', 'stanza'))
+def _analyze_story(text, top_k=None, min_similarity=None, coref=NER_COREF_ENABLED):
+    resolved = True
+    if coref and isinstance(text, str):
+        (text,), resolved = _resolve_for_analysis([text])
+    doc = parse_story(text)
+    with span('analyze', model='spacy_lg'):
+        result = _analyze_doc(doc, top_k=top_k, min_similarity=min_similarity)
+    # Coreference was asked for but not applied: the result must not be cached as if it had been
+    return result if resolved else Uncached(result)
+
+# Bulk mode: parse many stories with nlp.pipe, optionally across processes
+def analyze_stories(texts, batch_size=32, n_process=1, top_k=None, min_similarity=None, coref=NER_COREF_ENABLED):
+    """
+    Analyzes many stories, parsing each one exactly once.
+
+    Parameters:
+    - texts: Iterable of story texts.
+    - batch_size: Number of texts spaCy buffers per batch.
+    - n_process: Number of worker processes used by spaCy.
+    - top_k, min_similarity: Relationship pruning options (see analyze_character_relationships).
+    - coref: Resolve coreferences (in one batched Stanza pass) before parsing.
+
+    Returns:
+    - List of analysis dictionaries (same format as analyze_story), in input order.
+    """
+    return _analyze_stories(texts, batch_size, n_process, top_k, min_similarity, coref and coref_available())
+
+@cached_batch_stage('ner', models=('spacy_lg', 'stanza'), ignore=('batch_size', 'n_process'))
+def _analyze_stories(texts, batch_size=32, n_process=1, top_k=None, min_similarity=None, coref=NER_COREF_ENABLED):
+    resolved = True
+    if coref:
+        texts, resolved = _resolve_for_analysis(texts)
+    nlp_spacy = get_model('spacy_lg')
+    docs = nlp_spacy.pipe(
+        (str(text) for text in texts),
+        batch_size=batch_size,
+        n_process=n_process,
+        disable=_unused_components(nlp_spacy),
+    )
+    # Parsing is streamed and interleaved with the analysis, so both are timed together
+    with span('parse_and_analyze', model='spacy_lg'):
+        results = [_analyze_doc(doc, top_k=top_k, min_similarity=min_similarity) for doc in docs]
+    return results if resolved else [Uncached(result) for result in results]
+
 # Example usage:
 if __name__ == "__main__":
     text = """
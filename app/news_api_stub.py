@@ -0,0 +1,107 @@
+# app/news_api_stub.py
+"""
+Local stand-in for the News API's /v1/news/all endpoint, for offline testing.
+
+Usage:
+    python -m app.news_api_stub articles.jsonl --port 8766
+    export NEWS_API_URL=http://127.0.0.1:8766
+
+Articles are read from a JSONL file with 'uuid', 'title', 'description',
+'source', 'url' and 'published_at' fields. The file is re-read on every
+request, so appending lines simulates newly published stories. The q, page,
+limit and published_after parameters behave like the real API; the token is
+ignored.
+"""
+import argparse
+import json
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PORT = 8766
+DEFAULT_PAGE_LIMIT = 3
+
+
+def _load_articles(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def search(articles, params):
+    """Filters, sorts and pages `articles` like /v1/news/all; returns the response payload."""
+    query = params.get('q', '').lower()
+    published_after = params.get('published_after')
+    limit = int(params.get('limit', DEFAULT_PAGE_LIMIT))
+    page = int(params.get('page', 1))
+
+    matches = [
+        article for article in articles
+        if (not query or query in f"{article.get('title', '')} {article.get('description', '')}".lower())
+        and (not published_after or str(article.get('published_at', ''))[:19] > published_after)
+    ]
+    matches.sort(key=lambda article: str(article.get('published_at', '')), reverse=True)
+    data = matches[(page - 1) * limit:page * limit]
+    return {'meta': {'found': len(matches), 'returned': len(data), 'limit': limit, 'page': page}, 'data': data}
+
+
+class NewsApiStub:
+    """Serves search() over a JSONL file from a background thread."""
+
+    def __init__(self, path, host='127.0.0.1', port=DEFAULT_PORT):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parts = urllib.parse.urlsplit(self.path)
+                if parts.path != '/v1/news/all':
+                    self.send_error(404)
+                    return
+                stub.requests += 1
+                params = dict(urllib.parse.parse_qsl(parts.query))
+                body = json.dumps(search(_load_articles(stub.path), params)).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.path = path
+        self.requests = 0
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name='news-api-stub', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('articles', help='JSONL file of articles')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+
+    stub = NewsApiStub(args.articles, args.host, args.port)
+    print(f"News API stand-in listening on {stub.url}")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
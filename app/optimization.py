@@ -0,0 +1,191 @@
+# app/optimization.py
+"""
+Exports optimized CPU models and compares inference backends.
+
+Usage:
+    python -m app.optimization export --stages classification sentiment summarization
+    python -m app.optimization compare --stage classification --backends torch int8 onnx onnx-int8 --limit 500
+
+Dynamic int8 quantization of the PyTorch models happens at load time and needs
+no export. ONNX models are written to models/onnx/<stage> (and <stage>-int8).
+Select a backend per stage with NEWS_BACKEND_<STAGE>=<backend> or
+app.backends.set_backend(stage, backend).
+"""
+import argparse
+import os
+import time
+
+from .backends import BACKENDS, STAGE_MODELS, onnx_model_dir, set_backend, get_backend, stage_model_name
+from .result_cache import result_cache_disabled
+
+# Source weights and ONNX Runtime model class of each stage
+EXPORT_SOURCES = {
+    'classification': ('app.category_classification', 'CLASSIFIER_MODEL_DIR', 'ORTModelForSequenceClassification'),
+    'sentiment': ('app.sentiment_analysis', 'SENTIMENT_MODEL', 'ORTModelForSequenceClassification'),
+    'summarization': ('app.summarization', 'SUMMARIZER_MODEL', 'ORTModelForSeq2SeqLM'),
+}
+
+
+def export_onnx(stage, quantize=True):
+    """
+    Exports a stage's model to ONNX and, optionally, a dynamically quantized copy.
+
+    Returns:
+    - List of directories written.
+    """
+    import importlib
+    from transformers import AutoTokenizer
+    from optimum import onnxruntime
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+    module_name, source_attr, model_class = EXPORT_SOURCES[stage]
+    source = getattr(importlib.import_module(module_name), source_attr)
+
+    output_dir = onnx_model_dir(stage)
+    model = getattr(onnxruntime, model_class).from_pretrained(source, export=True)
+    model.save_pretrained(output_dir)
+    AutoTokenizer.from_pretrained(source).save_pretrained(output_dir)
+    written = [output_dir]
+
+    if quantize:
+        quantized_dir = onnx_model_dir(stage, quantized=True)
+        config = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+        # Seq2seq exports have separate encoder/decoder files, each quantized on its own
+        onnx_files = sorted(name for name in os.listdir(output_dir) if name.endswith('.onnx'))
+        for file_name in onnx_files:
+            quantizer = onnxruntime.ORTQuantizer.from_pretrained(output_dir, file_name=file_name)
+            quantizer.quantize(save_dir=quantized_dir, quantization_config=config)
+        AutoTokenizer.from_pretrained(source).save_pretrained(quantized_dir)
+        written.append(quantized_dir)
+    return written
+
+
+def load_held_out_texts(limit):
+    """Descriptions (and class ids) from models/test.csv, the set used by load_data."""
+    from .category_classification import load_data
+
+    _, test_df = load_data()
+    test_df = test_df.head(limit)
+    return test_df['description'].astype(str).tolist(), test_df['class_id'].tolist()
+
+
+def _run_stage(stage, texts, batch_size):
+    if stage == 'classification':
+        from .category_classification import classify_news_batch
+        return [r['label'] for r in classify_news_batch(texts, batch_size=batch_size)]
+    if stage == 'sentiment':
+        from .sentiment_analysis import sentiment_analysis_batch
+        return [r['label'] for r in sentiment_analysis_batch(texts, batch_size=batch_size)]
+    from .summarization import abstractive_summarize_batch
+    return abstractive_summarize_batch(texts, batch_size=batch_size)
+
+
+def _token_jaccard(a, b):
+    a, b = set(a.lower().split()), set(b.lower().split())
+    return len(a & b) / len(a | b) if a | b else 1.0
+
+
+# Measure real inference, never cached results
+@result_cache_disabled()
+def compare_backends(stage, backends=BACKENDS, limit=500, batch_size=16):
+    """
+    Runs a stage on the held-out set with each backend and compares it to the fp32 baseline.
+
+    Returns:
+    - Dictionary per backend with load time, model memory, latency per batch,
+      throughput (texts/sec), agreement with the torch backend and, for
+      classification, accuracy against the test labels.
+    """
+    from .category_classification import LABEL_MAP
+    from .model_registry import registry
+
+    texts, class_ids = load_held_out_texts(limit)
+    if stage == 'summarization':
+        texts = texts[:max(1, limit // 10)]
+
+    previous_backend = get_backend(stage)
+    report = {}
+    baseline = None
+    try:
+        for backend in ['torch'] + [b for b in backends if b != 'torch']:
+            set_backend(stage, backend)
+            name = stage_model_name(stage)
+            try:
+                registry.get(name)
+            except Exception as e:
+                report[backend] = {'error': str(e)}
+                continue
+
+            # Warm-up batch so one-off graph/kernel setup is not counted
+            _run_stage(stage, texts[:batch_size], batch_size)
+
+            latencies, outputs = [], []
+            for start in range(0, len(texts), batch_size):
+                batch = texts[start:start + batch_size]
+                began = time.perf_counter()
+                outputs.extend(_run_stage(stage, batch, batch_size))
+                latencies.append(time.perf_counter() - began)
+
+            stats = registry.stats()[name]
+            total = sum(latencies)
+            latencies.sort()
+            entry = {
+                'load_seconds': stats['load_seconds'],
+                'memory_mb': stats['memory_bytes'] / 1e6,
+                'p50_batch_ms': latencies[len(latencies) // 2] * 1000,
+                'p95_batch_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+                'texts_per_sec': len(texts) / total if total else None,
+            }
+            if baseline is None:
+                baseline = outputs
+            if stage == 'summarization':
+                entry['agreement'] = sum(map(_token_jaccard, outputs, baseline)) / len(outputs)
+            else:
+                entry['agreement'] = sum(a == b for a, b in zip(outputs, baseline)) / len(outputs)
+            if stage == 'classification':
+                entry['accuracy'] = sum(LABEL_MAP[c] == o for c, o in zip(class_ids, outputs)) / len(outputs)
+            report[backend] = entry
+
+            # Free this backend's model before loading the next one
+            registry.evict(name)
+    finally:
+        set_backend(stage, previous_backend)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = commands.add_parser('export', help='Export ONNX (and quantized ONNX) models')
+    export_parser.add_argument('--stages', nargs='+', choices=list(STAGE_MODELS), default=list(STAGE_MODELS))
+    export_parser.add_argument('--no-quantize', action='store_true')
+
+    compare_parser = commands.add_parser('compare', help='Compare backends on models/test.csv')
+    compare_parser.add_argument('--stage', choices=list(STAGE_MODELS), default='classification')
+    compare_parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=list(BACKENDS))
+    compare_parser.add_argument('--limit', type=int, default=500)
+    compare_parser.add_argument('--batch-size', type=int, default=16)
+
+    args = parser.parse_args()
+    if args.command == 'export':
+        for stage in args.stages:
+            for path in export_onnx(stage, quantize=not args.no_quantize):
+                print(f"Exported {stage} -> {path}")
+        return
+
+    report = compare_backends(args.stage, args.backends, args.limit, args.batch_size)
+    for backend, entry in report.items():
+        if 'error' in entry:
+            print(f"{backend:<10} unavailable: {entry['error']}")
+            continue
+        line = (f"{backend:<10} load {entry['load_seconds']:6.1f}s  mem {entry['memory_mb']:8.1f} MB  "
+                f"p50 {entry['p50_batch_ms']:8.1f} ms  p95 {entry['p95_batch_ms']:8.1f} ms  "
+                f"{entry['texts_per_sec']:7.1f} texts/s  agreement {entry['agreement']:.3f}")
+        if 'accuracy' in entry:
+            line += f"  accuracy {entry['accuracy']:.3f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
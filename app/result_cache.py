@@ -0,0 +1,298 @@
+# app/result_cache.py
+import contextlib
+import contextvars
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+
+from .model_registry import registry
+
+DEFAULT_CACHE_PATH = os.environ.get('NEWS_RESULT_CACHE_PATH', os.path.join('.cache', 'results.sqlite3'))
+DEFAULT_MAX_BYTES = int(os.environ.get('NEWS_RESULT_CACHE_MAX_MB', '512')) * 1024 * 1024
+
+
+def content_hash(text):
+    """SHA-256 of the text, so identical articles share entries whatever their URL."""
+    if not isinstance(text, str):
+        text = getattr(text, 'text', str(text))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def stage_version(models=()):
+    """
+    Identifier of the models a stage's output depends on.
+
+    `models` holds registry names, or callables returning one for stages whose
+    model depends on the selected inference backend.
+    """
+    names = [name() if callable(name) else name for name in models]
+    return '|'.join(f"{name}={registry.version(name)}" for name in names)
+
+
+def params_hash(params):
+    """Hash of a stage call's parameters other than its input text."""
+    return hashlib.sha256(repr(sorted(params.items())).encode('utf-8')).hexdigest()[:16]
+
+
+class Uncached:
+    """
+    Wraps a stage result that is returned to the caller but never stored,
+    such as an error fallback. The cache decorators unwrap it.
+    """
+
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+
+def _unwrap(value):
+    return value.value if isinstance(value, Uncached) else value
+
+
+class ResultCache:
+    """
+    Persistent cache of per-stage analysis results stored in a single SQLite file.
+
+    Entries are keyed by (stage, content hash, parameter hash, stage version).
+    When a stage's version changes (new model weights), its entries for other
+    versions are dropped the first time the new version is used; other stages
+    are unaffected. Calls with different parameters are separate entries of the
+    same version. The least recently used entries are evicted when the total
+    compressed size exceeds `max_bytes`.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._purged = set()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        columns = [row[1] for row in self._conn.execute('PRAGMA table_info(results)')]
+        if columns and 'params_hash' not in columns:
+            # Caches written before parameters had their own column are dropped, not migrated
+            self._conn.execute('DROP TABLE results')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            ' stage TEXT,'
+            ' content_hash TEXT,'
+            ' params_hash TEXT,'
+            ' version TEXT,'
+            ' value BLOB,'
+            ' last_access REAL,'
+            ' size INTEGER,'
+            ' PRIMARY KEY (stage, content_hash, params_hash, version))'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access)')
+        self._conn.commit()
+
+    def _count(self, stage, field):
+        stats = self._stats.setdefault(stage, {'hits': 0, 'misses': 0})
+        stats[field] += 1
+
+    def _purge_stale(self, stage, version):
+        if (stage, version) in self._purged:
+            return
+        self._conn.execute('DELETE FROM results WHERE stage = ? AND version != ?', (stage, version))
+        self._conn.commit()
+        self._purged.add((stage, version))
+
+    def get(self, stage, text_hash, version, params_key=''):
+        """Returns (True, value) on a hit and (False, None) on a miss."""
+        key = (stage, text_hash, params_key, version)
+        with self._lock:
+            self._purge_stale(stage, version)
+            row = self._conn.execute(
+                'SELECT value FROM results WHERE stage = ? AND content_hash = ? AND params_hash = ? AND version = ?',
+                key,
+            ).fetchone()
+            if row is None:
+                self._count(stage, 'misses')
+                return False, None
+            self._conn.execute(
+                'UPDATE results SET last_access = ?'
+                ' WHERE stage = ? AND content_hash = ? AND params_hash = ? AND version = ?',
+                (time.time(), *key),
+            )
+            self._conn.commit()
+            self._count(stage, 'hits')
+        return True, pickle.loads(zlib.decompress(row[0]))
+
+    def put(self, stage, text_hash, version, value, params_key=''):
+        blob = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (stage, text_hash, params_key, version, blob, time.time(), len(blob)),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            'SELECT stage, content_hash, params_hash, version, size FROM results ORDER BY last_access'
+        ).fetchall()
+        for stage, text_hash, params_key, version, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute(
+                'DELETE FROM results WHERE stage = ? AND content_hash = ? AND params_hash = ? AND version = ?',
+                (stage, text_hash, params_key, version),
+            )
+            total -= size
+            self._stats.setdefault(stage, {'hits': 0, 'misses': 0}).setdefault('evictions', 0)
+            self._stats[stage]['evictions'] += 1
+
+    def invalidate(self, stage=None):
+        """Drops all entries of one stage, or of every stage."""
+        with self._lock:
+            if stage is None:
+                self._conn.execute('DELETE FROM results')
+            else:
+                self._conn.execute('DELETE FROM results WHERE stage = ?', (stage,))
+            self._conn.commit()
+
+    def stats(self):
+        """Per-stage hit/miss/eviction counters and stored entry counts."""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT stage, COUNT(*), COALESCE(SUM(size), 0) FROM results GROUP BY stage'
+            ).fetchall()
+            report = {stage: dict(counts) for stage, counts in self._stats.items()}
+        for stage, entries, size in rows:
+            report.setdefault(stage, {'hits': 0, 'misses': 0}).update(entries=entries, bytes=size)
+        return report
+
+
+_cache = None
+_cache_lock = threading.Lock()
+_bypass = contextvars.ContextVar('result_cache_bypass', default=False)
+
+
+@contextlib.contextmanager
+def result_cache_disabled():
+    """
+    Bypasses the result cache inside a block (or a decorated function), e.g. to
+    time real inference. Only the current thread or task is affected.
+    """
+    token = _bypass.set(True)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+def get_result_cache():
+    """
+    Returns the process-wide result cache, or None when disabled with
+    NEWS_RESULT_CACHE=0 or inside result_cache_disabled().
+    """
+    global _cache
+    if os.environ.get('NEWS_RESULT_CACHE', '1') == '0' or _bypass.get():
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache()
+        return _cache
+
+
+def _bound_params(signature, args, kwargs, text_arg):
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    params = dict(bound.arguments)
+    return params.pop(text_arg), params
+
+
+def cached_stage(stage, models=(), text_arg='text'):
+    """
+    Caches a single-text stage function by content hash, parameters and stage version.
+
+    Parameters:
+    - stage: Stage name used in the cache key (e.g. 'classification').
+    - models: Registry names of the models the stage depends on.
+    - text_arg: Name of the argument holding the input text.
+
+    The wrapped function can return Uncached(value) for results that must not be stored.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            cache = get_result_cache()
+            if cache is None:
+                return _unwrap(func(*args, **kwargs))
+            text, params = _bound_params(signature, args, kwargs, text_arg)
+            text_hash, params_key, version = content_hash(text), params_hash(params), stage_version(models)
+            hit, value = cache.get(stage, text_hash, version, params_key)
+            if hit:
+                return value
+            value = func(*args, **kwargs)
+            if isinstance(value, Uncached):
+                return value.value
+            cache.put(stage, text_hash, version, value, params_key)
+            return value
+        return wrapper
+    return decorator
+
+
+def cached_batch_stage(stage, models=(), texts_arg='texts', ignore=()):
+    """
+    Caches a batch stage function item by item.
+
+    Only texts missing from the cache are passed to the wrapped function, in one
+    call, and results are returned in input order. Parameters listed in `ignore`
+    (e.g. batch_size) do not affect results and are left out of the key. Items
+    returned as Uncached(value) are passed through without being stored.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            cache = get_result_cache()
+            if cache is None:
+                return [_unwrap(value) for value in func(*args, **kwargs)]
+            texts, params = _bound_params(signature, args, kwargs, texts_arg)
+            texts = list(texts)
+            params_key = params_hash({k: v for k, v in params.items() if k not in ignore})
+            version = stage_version(models)
+
+            results = [None] * len(texts)
+            missing = {}
+            for i, text in enumerate(texts):
+                text_hash = content_hash(text)
+                hit, value = cache.get(stage, text_hash, version, params_key)
+                if hit:
+                    results[i] = value
+                else:
+                    missing.setdefault(text_hash, []).append(i)
+
+            if missing:
+                # Identical texts inside one batch are computed once
+                pending = [texts[positions[0]] for positions in missing.values()]
+                computed = func(**{texts_arg: pending}, **params)
+                for (text_hash, positions), value in zip(missing.items(), computed):
+                    if isinstance(value, Uncached):
+                        value = value.value
+                    else:
+                        cache.put(stage, text_hash, version, value, params_key)
+                    for i in positions:
+                        results[i] = value
+            return results
+        return wrapper
+    return decorator
@@ -1,12 +1,60 @@
 # app/sentiment_analysis.py
 
-from transformers import pipeline
+from .model_registry import register_model, get_model
+from .batching import batched_class_probabilities
+from .result_cache import cached_batch_stage
+from .backends import register_backend_variants, stage_model_name
 
-# Initialize sentiment analysis pipeline
-try:
-    sentiment_pipeline = pipeline("sentiment-analysis", model="cardiffnlp/twitter-roberta-base-sentiment")
-except Exception as e:
-    print(f"Error loading sentiment model: {e}. Ensure the model 'cardiffnlp/twitter-roberta-base-sentiment' is accessible.")
+SENTIMENT_MODEL = "cardiffnlp/twitter-roberta-base-sentiment"
+
+# Sentiment analysis pipeline, loaded on first use through the shared registry
+def _load_sentiment_pipeline():
+    from transformers import pipeline
+
+    try:
+        return pipeline("sentiment-analysis", model=SENTIMENT_MODEL)
+    except Exception as e:
+        print(f"Error loading sentiment model: {e}. Ensure the model '{SENTIMENT_MODEL}' is accessible.")
+        raise
+
+def _load_onnx_sentiment_pipeline(model_dir, file_name):
+    from transformers import AutoTokenizer, pipeline
+    from optimum.onnxruntime import ORTModelForSequenceClassification
+
+    model = ORTModelForSequenceClassification.from_pretrained(model_dir, file_name=file_name)
+    return pipeline("sentiment-analysis", model=model, tokenizer=AutoTokenizer.from_pretrained(model_dir))
+
+register_model('sentiment', _load_sentiment_pipeline, version=SENTIMENT_MODEL)
+register_backend_variants('sentiment', _load_sentiment_pipeline, SENTIMENT_MODEL, _load_onnx_sentiment_pipeline)
+
+# Model label index to readable label (LABEL_0, LABEL_1, LABEL_2)
+SENTIMENT_LABELS = ["Negative", "Neutral", "Positive"]
+
+@cached_batch_stage('sentiment', models=(lambda: stage_model_name('sentiment'),), ignore=('batch_size',))
+def sentiment_analysis_batch(texts, batch_size=16, max_length=512):
+    """
+    Analyzes the sentiment of many texts with one forward pass per length-bucketed batch.
+
+    :param texts: List of input texts for sentiment analysis
+    :param batch_size: Maximum number of texts per forward pass
+    :param max_length: Truncation length in tokens
+    :return: List of dictionaries with 'label', 'score' and 'probabilities', in input order
+    """
+    model_name = stage_model_name('sentiment')
+    sentiment_pipeline = get_model(model_name)
+    probabilities = batched_class_probabilities(
+        sentiment_pipeline.tokenizer, sentiment_pipeline.model, texts, batch_size, max_length, name=model_name
+    )
+
+    results = []
+    for probs in probabilities:
+        predicted = max(range(len(probs)), key=probs.__getitem__)
+        results.append({
+            'label': SENTIMENT_LABELS[predicted],
+            'score': probs[predicted],
+            'probabilities': dict(zip(SENTIMENT_LABELS, probs)),
+        })
+    return results
 
 def sentiment_analysis(text):
     """
@@ -16,19 +64,8 @@ def sentiment_analysis(text):
     :return: A sentiment label (Positive, Neutral, Negative) with its confidence score
     """
     try:
-        result = sentiment_pipeline(text, truncation=True, max_length=512)
-        sentiment_label = result[0]['label']
-        confidence_score = result[0]['score']
-        
-        # Convert label to a readable format
-        if sentiment_label == "LABEL_0":
-            sentiment = "Negative"
-        elif sentiment_label == "LABEL_1":
-            sentiment = "Neutral"
-        else:
-            sentiment = "Positive"
-        
-        return f"{sentiment} (Confidence: {confidence_score:.2f})"
+        result = sentiment_analysis_batch([text])[0]
+        return f"{result['label']} (Confidence: {result['score']:.2f})"
     
     except Exception as e:
         return f"Error in sentiment analysis: {e}"
@@ -0,0 +1,92 @@
+# app/startup_profile.py
+"""
+Reports how long a cold worker spends importing each module and loading each model.
+
+Usage:
+    python -m app.startup_profile                       # imports only
+    python -m app.startup_profile --models summarizer sentiment
+    python -m app.startup_profile --models all
+
+Run it in a fresh interpreter: modules imported earlier are already cached.
+"""
+import argparse
+import importlib
+import sys
+import time
+
+# Third-party libraries are imported first so their cost is not attributed to our modules
+LIBRARIES = ['numpy', 'scipy.sparse', 'pandas', 'requests', 'bs4', 'torch', 'transformers', 'spacy', 'stanza']
+APP_MODULES = [
+    'app.model_registry',
+    'app.result_cache',
+    'app.data_collection',
+    'app.summarization',
+    'app.sentiment_analysis',
+    'app.category_classification',
+    'app.ner_extraction',
+]
+
+
+def profile_imports(modules):
+    """Returns a list of (module, seconds, error) for each module, imported in order."""
+    timings = []
+    for name in modules:
+        if name in sys.modules:
+            timings.append((name, 0.0, 'already imported'))
+            continue
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+            error = None
+        except ImportError as e:
+            error = str(e)
+        timings.append((name, time.perf_counter() - start, error))
+    return timings
+
+
+def profile_models(names):
+    """Loads each model through the registry and returns its registry statistics."""
+    from .model_registry import registry
+
+    report = {}
+    for name in names:
+        try:
+            registry.get(name)
+        except Exception as e:
+            report[name] = {'error': str(e)}
+            continue
+        report[name] = registry.stats()[name]
+    return report
+
+
+def main():
+    from .model_registry import MODEL_PROVIDERS
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--models', nargs='*', default=[],
+                        help=f"Models to load ('all' or any of: {', '.join(MODEL_PROVIDERS)})")
+    parser.add_argument('--skip-libraries', action='store_true',
+                        help='Do not pre-import third-party libraries (attribute their cost to app modules)')
+    args = parser.parse_args()
+
+    modules = APP_MODULES if args.skip_libraries else LIBRARIES + APP_MODULES
+    print("Imports:")
+    total = 0.0
+    for name, seconds, error in profile_imports(modules):
+        total += seconds
+        suffix = f"  ({error})" if error else ""
+        print(f"  {name:<32} {seconds * 1000:9.1f} ms{suffix}")
+    print(f"  {'total':<32} {total * 1000:9.1f} ms")
+
+    names = list(MODEL_PROVIDERS) if args.models == ['all'] else args.models
+    if names:
+        print("Models:")
+        for name, stats in profile_models(names).items():
+            if 'error' in stats:
+                print(f"  {name:<20} failed: {stats['error']}")
+            else:
+                print(f"  {name:<20} {stats['load_seconds']:8.2f} s  {stats['memory_bytes'] / 1e6:9.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
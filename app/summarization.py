@@ -1,17 +1,50 @@
+import math
 import re
-import spacy
-from transformers import pipeline
-from heapq import nlargest
-from collections import defaultdict
-
-# Load spaCy and transformers models
-try:
-    nlp = spacy.load('en_core_web_sm')
-    summarizer = pipeline("summarization", model="facebook/bart-large-cnn")
-except OSError as e:
-    print("Required models not found. Please run:")
-    print("python -m spacy download en_core_web_sm")
-    print("pip install transformers")
+import numpy as np
+from scipy import sparse
+from .model_registry import register_model, get_model
+from .result_cache import Uncached, cached_stage, cached_batch_stage
+from .backends import register_backend_variants, stage_model_name
+from .instrumentation import span, increment, observe
+
+SUMMARIZER_MODEL = "facebook/bart-large-cnn"
+
+# spaCy and transformers models, loaded on first use through the shared registry
+def _load_sentencizer():
+    # Sentence boundaries and lexical attributes (stop words, punctuation) are all
+    # extractive summarization needs, so no tagger, parser or NER is loaded
+    import spacy
+
+    nlp = spacy.blank('en')
+    nlp.add_pipe('sentencizer')
+    return nlp
+
+def _load_summarizer():
+    from transformers import pipeline
+
+    return pipeline("summarization", model=SUMMARIZER_MODEL)
+
+register_model('sentencizer', _load_sentencizer, version='spacy-blank-en:sentencizer')
+
+def _load_onnx_summarizer(model_dir, file_name):
+    from transformers import AutoTokenizer, pipeline
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+
+    if file_name:
+        # Quantized seq2seq exports keep encoder and decoders in separate files
+        suffix = file_name.replace('model', '', 1)
+        model = ORTModelForSeq2SeqLM.from_pretrained(
+            model_dir,
+            encoder_file_name=f'encoder_model{suffix}',
+            decoder_file_name=f'decoder_model{suffix}',
+            decoder_with_past_file_name=f'decoder_with_past_model{suffix}',
+        )
+    else:
+        model = ORTModelForSeq2SeqLM.from_pretrained(model_dir)
+    return pipeline("summarization", model=model, tokenizer=AutoTokenizer.from_pretrained(model_dir))
+
+register_model('summarizer', _load_summarizer, version=SUMMARIZER_MODEL)
+register_backend_variants('summarization', _load_summarizer, SUMMARIZER_MODEL, _load_onnx_summarizer)
 
 def clean_text(text):
     """Basic text cleaning"""
@@ -19,50 +52,265 @@ def clean_text(text):
     text = re.sub(r'[^a-zA-Z\s]', ' ', text)
     return text
 
-def extractive_summarize(text, num_sentences=3):
+def build_idf_table(texts):
+    """
+    Build a corpus-level IDF table for TF-IDF weighted extractive summaries
+
+    Returns a dictionary mapping lower-cased content words to smoothed IDF values.
+    """
+    nlp = get_model('sentencizer')
+    document_frequency = {}
+    total = 0
+    for doc in nlp.pipe(texts, batch_size=256):
+        total += 1
+        for term in {token.lower_ for token in doc if _is_content_word(token)}:
+            document_frequency[term] = document_frequency.get(term, 0) + 1
+    return {term: math.log((1 + total) / (1 + df)) + 1 for term, df in document_frequency.items()}
+
+def _is_content_word(token):
+    return not (token.is_stop or token.is_punct or token.is_space)
+
+def _summarize_doc(doc, num_sentences, idf):
+    """Score all sentences of a Doc with one sparse sentence x term product"""
+    sentences = list(doc.sents)
+    rows, cols = [], []
+    term_ids = {}
+    for row, sent in enumerate(sentences):
+        for token in sent:
+            if _is_content_word(token):
+                rows.append(row)
+                cols.append(term_ids.setdefault(token.lower_, len(term_ids)))
+
+    # Nothing to score (no content words): fall back to the leading sentences
+    if not term_ids:
+        return ' '.join(sent.text for sent in sentences[:num_sentences]).strip()
+
+    counts = sparse.csr_matrix(
+        (np.ones(len(rows)), (rows, cols)), shape=(len(sentences), len(term_ids))
+    )
+    # Term weights: frequency normalized by the most frequent term, optionally times IDF
+    frequencies = np.bincount(cols, minlength=len(term_ids)).astype(float)
+    weights = frequencies / frequencies.max()
+    if idf:
+        default_idf = max(idf.values())
+        weights *= np.array([idf.get(term, default_idf) for term in term_ids])
+
+    scores = counts @ weights
+    has_terms = np.diff(counts.indptr) > 0
+    # Stable sort keeps earlier sentences first on ties
+    ranked = [i for i in np.argsort(-scores, kind='stable') if has_terms[i]]
+    return ' '.join(str(sentences[i]) for i in ranked[:num_sentences])
+
+def extractive_summarize(text, num_sentences=3, idf=None):
     """
     Perform extractive summarization using sentence importance scoring
+
+    Parameters:
+    - idf: Optional IDF table (see build_idf_table) for TF-IDF weighted scoring
     """
-    doc = nlp(text)
-    word_frequencies = defaultdict(int)
-    
-    # Calculate word frequencies excluding stop words
-    for word in doc:
-        if not word.is_stop and not word.is_punct:
-            word_frequencies[word.text.lower()] += 1
-    
-    # Normalize frequencies
-    max_frequency = max(word_frequencies.values())
-    for word in word_frequencies:
-        word_frequencies[word] /= max_frequency
-    
-    # Score sentences based on word frequencies
-    sentence_scores = {}
-    for sent in doc.sents:
-        for word in sent:
-            if word.text.lower() in word_frequencies:
-                if sent not in sentence_scores:
-                    sentence_scores[sent] = word_frequencies[word.text.lower()]
-                else:
-                    sentence_scores[sent] += word_frequencies[word.text.lower()]
-    
-    # Get top N sentences
-    summary_sentences = nlargest(num_sentences, sentence_scores, key=sentence_scores.get)
-    summary = ' '.join([str(sent) for sent in summary_sentences])
-    
-    return summary
+    nlp = get_model('sentencizer')
+    with span('parse', model='sentencizer'):
+        doc = nlp(text)
+    return _summarize_doc(doc, num_sentences, idf)
+
+def extractive_summarize_many(texts, num_sentences=3, idf=None, batch_size=256):
+    """
+    Perform extractive summarization of many texts with one streamed spaCy pass
+    """
+    nlp = get_model('sentencizer')
+    return [_summarize_doc(doc, num_sentences, idf) for doc in nlp.pipe(texts, batch_size=batch_size)]
 
-def abstractive_summarize(text, max_length=200, min_length=30):
+# BART-large-CNN accepts at most 1024 input tokens; leave room for special tokens
+CHUNK_MAX_TOKENS = 1000
+
+def split_into_chunks(text, max_tokens=CHUNK_MAX_TOKENS):
+    """
+    Split text into chunks of at most `max_tokens` summarizer tokens on sentence boundaries
+
+    A single sentence longer than the budget becomes its own chunk and is truncated by the model.
+    """
+    tokenizer = get_model(stage_model_name('summarization')).tokenizer
+    nlp = get_model('sentencizer')
+    sentences = [sent.text.strip() for sent in nlp(text).sents if sent.text.strip()]
+    if not sentences:
+        return [text]
+    lengths = [len(ids) for ids in tokenizer(sentences, add_special_tokens=False)['input_ids']]
+
+    chunks, current, current_tokens = [], [], 0
+    for sentence, length in zip(sentences, lengths):
+        if current and current_tokens + length > max_tokens:
+            chunks.append(' '.join(current))
+            current, current_tokens = [], 0
+        current.append(sentence)
+        current_tokens += length
+    if current:
+        chunks.append(' '.join(current))
+    return chunks
+
+def _generate(texts, max_length, min_length, batch_size, generate_kwargs):
+    """One batched generation call over all texts"""
+    model_name = stage_model_name('summarization')
+    summarizer = get_model(model_name)
+    observe('batch_size', len(texts), model=model_name)
+    with span('generate', model=model_name):
+        outputs = summarizer(list(texts), max_length=max_length, min_length=min_length, do_sample=False,
+                             truncation=True, batch_size=batch_size, **generate_kwargs)
+    return [output['summary_text'] for output in outputs]
+
+def _generate_each(texts, max_length, min_length, batch_size, generate_kwargs):
+    """
+    Batched generation that isolates failures
+
+    A batch that fails is retried one text at a time, and texts that still fail
+    get None, so one bad text does not fail the others.
+    """
+    results = []
+    for start in range(0, len(texts), batch_size):
+        batch = texts[start:start + batch_size]
+        try:
+            results.extend(_generate(batch, max_length, min_length, batch_size, generate_kwargs))
+            continue
+        except Exception as e:
+            if len(batch) == 1:
+                print(f"Error in abstractive summarization: {e}")
+                results.append(None)
+                continue
+            print(f"Error in abstractive summarization batch, retrying its texts one by one: {e}")
+        for text in batch:
+            try:
+                results.extend(_generate([text], max_length, min_length, 1, generate_kwargs))
+            except Exception as e:
+                print(f"Error in abstractive summarization: {e}")
+                results.append(None)
+    return results
+
+def _token_lengths(texts):
+    tokenizer = get_model(stage_model_name('summarization')).tokenizer
+    return [len(ids) for ids in tokenizer(list(texts), add_special_tokens=False)['input_ids']]
+
+def _summarize_documents(texts, max_length, min_length, batch_size, reduce, chunk_max_tokens, generate_kwargs):
+    """
+    Map-reduce summarization of several documents
+
+    Every chunk of every document is summarized in shared generation batches (map).
+    Documents split into several chunks then have their joined partial summaries
+    summarized again (reduce). While the joined partials are still longer than
+    `chunk_max_tokens` they are chunked and mapped once more, so the final
+    reduce never truncates its input.
+
+    Returns one summary per document, or None for documents whose generation failed.
+    """
+    model_name = stage_model_name('summarization')
+    with span('tokenize', model=model_name):
+        lengths = _token_lengths(texts)
+    increment('tokens', sum(lengths), model=model_name)
+
+    with span('chunk', model=model_name):
+        pending = {
+            i: split_into_chunks(text, chunk_max_tokens) if length > chunk_max_tokens else [text]
+            for i, (text, length) in enumerate(zip(texts, lengths))
+        }
+    summaries = [None] * len(texts)
+    to_reduce = {}
+    previous_lengths = dict(enumerate(lengths))
+
+    while pending:
+        flat_chunks = [chunk for chunks in pending.values() for chunk in chunks]
+        partials = _generate_each(flat_chunks, max_length, min_length, batch_size, generate_kwargs)
+
+        joined, position = {}, 0
+        for i, chunks in pending.items():
+            parts = partials[position:position + len(chunks)]
+            position += len(chunks)
+            if any(part is None for part in parts):
+                to_reduce.pop(i, None)  # failed: the summary stays None
+                continue
+            if reduce and (len(chunks) > 1 or i in to_reduce):
+                joined[i] = ' '.join(parts)
+            else:
+                summaries[i] = ' '.join(parts)
+
+        pending = {}
+        if joined:
+            with span('chunk', model=model_name):
+                for i, length in zip(joined, _token_lengths(joined.values())):
+                    # Stop re-mapping if a round did not shrink the text (the reduce then truncates)
+                    if length > chunk_max_tokens and length < previous_lengths[i]:
+                        pending[i] = split_into_chunks(joined[i], chunk_max_tokens)
+                        previous_lengths[i] = length
+                    to_reduce[i] = joined[i]
+
+    if to_reduce:
+        reduced = _generate_each(list(to_reduce.values()), max_length, min_length, batch_size, generate_kwargs)
+        for i, summary in zip(to_reduce, reduced):
+            summaries[i] = summary
+    return summaries
+
+def abstractive_summarize(text, max_length=200, min_length=30, num_beams=None, early_stopping=None,
+                          reduce=True, chunk_max_tokens=CHUNK_MAX_TOKENS, batch_size=8):
     """
     Perform abstractive summarization using BART
+
+    Articles longer than the model's input limit are split into sentence-aligned
+    chunks that are summarized together in batched generation calls, then
+    optionally reduced with a second pass over the partial summaries.
+
+    Parameters:
+    - num_beams, early_stopping: Generation settings; fewer beams are faster on CPU
+      (None keeps the model's defaults).
+    - reduce: Summarize the joined partial summaries of long articles once more.
+    - chunk_max_tokens: Token budget per chunk.
+    - batch_size: Chunks per generation batch.
+
+    If generation fails the text is returned unchanged.
     """
     try:
-        summary = summarizer(text, max_length=max_length, min_length=min_length, do_sample=False)
-        return summary[0]['summary_text']
+        return _abstractive_summary(text, max_length, min_length, num_beams, early_stopping,
+                                    reduce, chunk_max_tokens, batch_size)
     except Exception as e:
         print(f"Error in abstractive summarization: {e}")
         return text
 
+def _abstractive_summary(text, max_length=200, min_length=30, num_beams=None, early_stopping=None,
+                         reduce=True, chunk_max_tokens=CHUNK_MAX_TOKENS, batch_size=8):
+    """abstractive_summarize without the fallback: generation errors are raised"""
+    generate_kwargs = _generation_kwargs(num_beams, early_stopping)
+    summary = _summarize_documents([text], max_length, min_length, batch_size, reduce,
+                                   chunk_max_tokens, generate_kwargs)[0]
+    if summary is None:
+        raise RuntimeError("summary generation failed")
+    return summary
+
+def _generation_kwargs(num_beams, early_stopping):
+    generate_kwargs = {}
+    if num_beams is not None:
+        generate_kwargs['num_beams'] = num_beams
+    if early_stopping is not None:
+        generate_kwargs['early_stopping'] = early_stopping
+    return generate_kwargs
+
+@cached_batch_stage('abstractive_summarization', models=(lambda: stage_model_name('summarization'),), ignore=('batch_size',))
+def abstractive_summarize_batch(texts, max_length=200, min_length=30, num_beams=None, early_stopping=None,
+                                reduce=True, chunk_max_tokens=CHUNK_MAX_TOKENS, batch_size=8):
+    """
+    Perform abstractive summarization of many texts with batched BART generation
+
+    Long texts are chunked as in abstractive_summarize, with the chunks of all texts
+    sharing the same generation batches. A text whose generation fails is
+    returned unchanged, like abstractive_summarize, and is not cached; the
+    other texts of the call are unaffected.
+    """
+    texts = list(texts)
+    try:
+        generate_kwargs = _generation_kwargs(num_beams, early_stopping)
+        summaries = _summarize_documents(texts, max_length, min_length, batch_size, reduce,
+                                         chunk_max_tokens, generate_kwargs)
+    except Exception as e:
+        print(f"Error in abstractive summarization: {e}")
+        summaries = [None] * len(texts)
+    return [Uncached(text) if summary is None else summary for text, summary in zip(texts, summaries)]
+
+@cached_stage('summarization', models=('sentencizer', lambda: stage_model_name('summarization')))
 def summarize_article(text, method='both', num_sentences=3):
     """
     Main function to summarize text using either or both methods
@@ -73,7 +321,8 @@ def summarize_article(text, method='both', num_sentences=3):
     - num_sentences: Number of sentences for extractive summary
     
     Returns:
-    - Dictionary containing requested summaries
+    - Dictionary containing requested summaries (if abstractive generation fails
+      the text itself is returned as that summary, and the result is not cached)
     """
     result = {}
     
@@ -81,6 +330,11 @@ def summarize_article(text, method='both', num_sentences=3):
         result['extractive'] = extractive_summarize(text, num_sentences)
     
     if method in ['abstractive', 'both']:
-        result['abstractive'] = abstractive_summarize(text)
+        try:
+            result['abstractive'] = _abstractive_summary(text)
+        except Exception as e:
+            print(f"Error in abstractive summarization: {e}")
+            result['abstractive'] = text
+            return Uncached(result)
     
     return result
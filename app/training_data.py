@@ -0,0 +1,191 @@
+# app/training_data.py
+"""
+Pre-tokenized, memory-mapped training data for the category classifier.
+
+Usage:
+    python -m app.training_data            # tokenize the full models/train.csv once
+
+Texts are tokenized a single time into a flat int32 token file plus offset
+and label arrays. Training then reads token slices straight from the
+memory map, batches examples of similar length together and pads each batch
+only to its longest member.
+"""
+import hashlib
+import json
+import os
+import random
+
+import numpy as np
+import pandas as pd
+import torch
+from torch.utils.data import Dataset, Sampler
+
+TOKENIZED_DIR = os.path.join('models', 'tokenized')
+
+
+def _fingerprint(df, text_column, label_column, tokenizer_name, max_len):
+    digest = hashlib.sha1()
+    digest.update(f"{tokenizer_name}|{max_len}|{text_column}|{label_column}|{len(df)}".encode('utf-8'))
+    digest.update(np.asarray(df.index.values).tobytes())
+    # The contents too, so a replaced CSV of the same shape is tokenized again
+    digest.update(pd.util.hash_pandas_object(df[text_column].astype(str), index=False).to_numpy().tobytes())
+    digest.update(pd.util.hash_pandas_object(df[label_column], index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def preprocess_dataset(df, tokenizer, prefix, text_column='description', label_column='class_id',
+                       max_len=512, chunk_size=10000):
+    """
+    Tokenizes a DataFrame once into memory-mappable arrays.
+
+    Writes <prefix>.tokens (flat int32 token ids), <prefix>.offsets.npy (int64,
+    one more than the number of rows), <prefix>.labels.npy and <prefix>.json.
+    Existing files for the same rows (texts and labels), tokenizer and max_len are reused.
+
+    Returns:
+    - The prefix, for TokenizedNewsDataset.
+    """
+    fingerprint = _fingerprint(df, text_column, label_column, tokenizer.name_or_path, max_len)
+    meta_path = prefix + '.json'
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            if json.load(f).get('fingerprint') == fingerprint:
+                return prefix
+
+    if os.path.dirname(prefix):
+        os.makedirs(os.path.dirname(prefix), exist_ok=True)
+    texts = df[text_column].astype(str).tolist()
+    offsets = [0]
+    with open(prefix + '.tokens', 'wb') as tokens_file:
+        for start in range(0, len(texts), chunk_size):
+            encoded = tokenizer(texts[start:start + chunk_size], max_length=max_len, truncation=True)['input_ids']
+            for ids in encoded:
+                tokens_file.write(np.asarray(ids, dtype=np.int32).tobytes())
+                offsets.append(offsets[-1] + len(ids))
+            print(f"Tokenized {min(start + chunk_size, len(texts))}/{len(texts)} examples")
+
+    np.save(prefix + '.offsets.npy', np.asarray(offsets, dtype=np.int64))
+    np.save(prefix + '.labels.npy', df[label_column].to_numpy(dtype=np.int64))
+    with open(meta_path, 'w') as f:
+        json.dump({'fingerprint': fingerprint, 'rows': len(texts), 'tokens': offsets[-1],
+                   'pad_token_id': tokenizer.pad_token_id}, f)
+    return prefix
+
+
+class TokenizedNewsDataset(Dataset):
+    """
+    Dataset over arrays written by preprocess_dataset; the token file is memory-mapped.
+
+    With `soft_targets` (one probability row per example, e.g. a teacher
+    model's predictions) items are (token ids, label, soft target) triples.
+    """
+
+    def __init__(self, prefix, soft_targets=None):
+        self.prefix = prefix
+        self.offsets = np.load(prefix + '.offsets.npy')
+        self.labels = np.load(prefix + '.labels.npy')
+        self.soft_targets = soft_targets
+        with open(prefix + '.json') as f:
+            self.pad_token_id = json.load(f)['pad_token_id']
+        self._tokens = None
+
+    @property
+    def tokens(self):
+        # Opened lazily so each DataLoader worker maps the file itself
+        if self._tokens is None:
+            self._tokens = np.memmap(self.prefix + '.tokens', dtype=np.int32, mode='r')
+        return self._tokens
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_tokens'] = None
+        return state
+
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, idx):
+        start, end = self.offsets[idx], self.offsets[idx + 1]
+        if self.soft_targets is not None:
+            return np.array(self.tokens[start:end]), int(self.labels[idx]), self.soft_targets[idx]
+        return np.array(self.tokens[start:end]), int(self.labels[idx])
+
+
+class LengthBucketSampler(Sampler):
+    """
+    Yields batches of indices with similar token lengths.
+
+    Indices are shuffled, split into pools of `batch_size * pool_batches`,
+    sorted by length inside each pool and cut into batches; batch order is
+    shuffled again so training still sees lengths in random order.
+    """
+
+    def __init__(self, lengths, batch_size, pool_batches=50, seed=42):
+        self.lengths = np.asarray(lengths)
+        self.batch_size = batch_size
+        self.pool_size = batch_size * pool_batches
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def __iter__(self):
+        rng = random.Random(self.seed + self.epoch)
+        indices = list(range(len(self.lengths)))
+        rng.shuffle(indices)
+        batches = []
+        for start in range(0, len(indices), self.pool_size):
+            pool = sorted(indices[start:start + self.pool_size], key=lambda i: self.lengths[i])
+            batches.extend(pool[i:i + self.batch_size] for i in range(0, len(pool), self.batch_size))
+        rng.shuffle(batches)
+        return iter(batches)
+
+    def __len__(self):
+        return (len(self.lengths) + self.batch_size - 1) // self.batch_size
+
+
+class DynamicPaddingCollator:
+    """
+    Pads a batch of (token ids, label) pairs to its longest member.
+
+    Soft targets of (token ids, label, soft target) triples are stacked under
+    `soft_target_key`.
+    """
+
+    def __init__(self, pad_token_id, soft_target_key='soft_targets'):
+        self.pad_token_id = pad_token_id
+        self.soft_target_key = soft_target_key
+
+    def __call__(self, examples):
+        max_len = max(len(example[0]) for example in examples)
+        input_ids = torch.full((len(examples), max_len), self.pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(examples), max_len), dtype=torch.long)
+        for row, example in enumerate(examples):
+            ids = example[0]
+            input_ids[row, :len(ids)] = torch.from_numpy(ids.astype(np.int64))
+            attention_mask[row, :len(ids)] = 1
+        labels = torch.tensor([example[1] for example in examples], dtype=torch.long)
+        batch = {'input_ids': input_ids, 'attention_mask': attention_mask, 'labels': labels}
+        if len(examples[0]) > 2:
+            batch[self.soft_target_key] = torch.tensor(np.stack([example[2] for example in examples]),
+                                                       dtype=torch.float)
+        return batch
+
+
+def main():
+    from transformers import RobertaTokenizer
+    from .category_classification import load_data
+
+    train_df, test_df = load_data(sample_size=None)
+    tokenizer = RobertaTokenizer.from_pretrained('roberta-base')
+    for name, df in (('train', train_df), ('test', test_df)):
+        prefix = preprocess_dataset(df, tokenizer, os.path.join(TOKENIZED_DIR, name))
+        print(f"Wrote {prefix} ({len(df)} examples)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# benchmarks/html_extraction.py
+"""
+Compares the lxml and BeautifulSoup article extraction backends on a saved
+corpus of news HTML pages.
+
+The committed corpus (benchmarks/html_corpus) holds hand-written pages covering
+the cases the backends must agree on: UTF-8 without a declared charset, a
+latin-1 <meta charset>, unclosed <p> tags and block elements inside paragraphs,
+scripts and comments inside paragraphs, navigation boilerplate, a page wrapped
+in one <form> (ASP.NET WebForms), a lede inside <article><header> and a long
+page. Real pages can be added with --save. Both backends must return exactly
+the same paragraphs.
+
+Usage:
+    python -m benchmarks.html_extraction --save URL [URL ...]   # add pages to the corpus
+    python -m benchmarks.html_extraction --repeat 5             # run the benchmark
+"""
+import argparse
+import glob
+import hashlib
+import os
+import sys
+import time
+
+from app.html_extraction import (extract_article_text, extract_paragraphs_bs4, extract_paragraphs_lxml,
+                                 DEFAULT_MAX_PARAGRAPHS, etree)
+
+DEFAULT_CORPUS_DIR = os.path.join(os.path.dirname(__file__), 'html_corpus')
+
+
+def save_pages(urls, corpus_dir):
+    import requests
+
+    os.makedirs(corpus_dir, exist_ok=True)
+    for url in urls:
+        response = requests.get(url, timeout=(5, 15))
+        response.raise_for_status()
+        name = hashlib.sha1(url.encode('utf-8')).hexdigest()[:16] + '.html'
+        with open(os.path.join(corpus_dir, name), 'wb') as f:
+            f.write(response.content)
+        print(f"Saved {url} -> {name} ({len(response.content)} bytes)")
+
+
+def time_backend(pages, backend, repeat):
+    """Returns the best total seconds over `repeat` runs."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for html in pages:
+            extract_article_text(html, backend=backend)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def compare_paragraphs(pages):
+    """Returns (index, bs4 paragraphs, lxml paragraphs) for every page the backends disagree on."""
+    mismatches = []
+    for i, html in enumerate(pages):
+        expected = extract_paragraphs_bs4(html, DEFAULT_MAX_PARAGRAPHS)
+        actual = extract_paragraphs_lxml(html)
+        if expected != actual:
+            mismatches.append((i, expected, actual))
+    return mismatches
+
+
+def run(corpus_dir, repeat):
+    """Prints timings and paragraph mismatches; returns the number of mismatching pages."""
+    paths = sorted(glob.glob(os.path.join(corpus_dir, '*.html')))
+    if not paths:
+        print(f"No .html pages in {corpus_dir}; add some with --save URL")
+        return 0
+    if etree is None:
+        print("lxml is not installed; only the BeautifulSoup backend is available")
+        return 0
+
+    pages = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            pages.append(f.read())
+    total_mb = sum(len(page) for page in pages) / 1e6
+
+    bs4_seconds = time_backend(pages, 'bs4', repeat)
+    lxml_seconds = time_backend(pages, 'lxml', repeat)
+    mismatches = compare_paragraphs(pages)
+
+    print(f"Pages: {len(pages)} ({total_mb:.1f} MB)")
+    print(f"bs4:  {bs4_seconds * 1000 / len(pages):.2f} ms/page")
+    print(f"lxml: {lxml_seconds * 1000 / len(pages):.2f} ms/page ({bs4_seconds / lxml_seconds:.1f}x)")
+    print(f"Identical paragraphs: {len(pages) - len(mismatches)}/{len(pages)}")
+    for i, expected, actual in mismatches:
+        first = next((j for j, (a, b) in enumerate(zip(expected, actual)) if a != b), min(len(expected), len(actual)))
+        print(f"MISMATCH {os.path.basename(paths[i])}: {len(expected)} bs4 vs {len(actual)} lxml paragraphs, "
+              f"first difference at paragraph {first}")
+        print(f"  bs4:  {expected[first] if first < len(expected) else None!r}")
+        print(f"  lxml: {actual[first] if first < len(actual) else None!r}")
+    return len(mismatches)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS_DIR)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--save', nargs='+', metavar='URL', help='Download pages into the corpus instead')
+    args = parser.parse_args()
+
+    if args.save:
+        save_pages(args.save, args.corpus)
+    elif run(args.corpus, args.repeat):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+# benchmarks/run_benchmarks.py
+"""
+Per-stage latency/throughput benchmarks.
+
+Usage:
+    python -m benchmarks.run_benchmarks --tiny --output bench.json
+    python -m benchmarks.run_benchmarks --tiny --compare bench.json --tolerance 0.2
+    python -m benchmarks.run_benchmarks --stages classification sentiment --batch-sizes 1 16
+
+Every stage runs over three input-size tiers (headline, description, full
+article) and several batch sizes, reporting p50/p95 latency per call,
+throughput and peak RSS. --tiny swaps in tiny randomly initialized models of
+the same architectures (and a blank spaCy pipeline), so the suite runs with no
+network access or model downloads. Results saved with --output can be
+compared against a later run with --compare to catch regressions.
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import time
+
+from app.result_cache import result_cache_disabled
+from benchmarks.html_extraction import DEFAULT_CORPUS_DIR
+
+STAGES = ('html', 'extractive', 'abstractive', 'classification', 'sentiment', 'ner')
+TIERS = {'headline': 12, 'description': 40, 'full_article': 600}
+
+_WORDS = ('market government team company report season minister growth players shares election '
+          'technology league profits officials research launch city court energy prices health '
+          'announced said expected reported increased agreed rejected signed warned plans').split()
+_NAMES = ('Emma Clarke', 'Leo Martin', 'Henry Ford', 'Maria Lopez', 'David Chen', 'Sarah Kim')
+_ADJECTIVES = ('strong', 'weak', 'new', 'early', 'major', 'local', 'global', 'careful', 'bold')
+
+
+def synthetic_text(n_words, seed):
+    """Deterministic news-like text of about `n_words` words, with people and adjectives."""
+    rng = random.Random(seed)
+    sentences, count = [], 0
+    while count < n_words:
+        length = rng.randint(8, 18)
+        words = [rng.choice(_NAMES)] + [
+            rng.choice(_ADJECTIVES) + ' ' + rng.choice(_WORDS) if rng.random() < 0.3 else rng.choice(_WORDS)
+            for _ in range(length)
+        ]
+        sentences.append(' '.join(words) + '.')
+        count += length + 1
+    return ' '.join(sentences)
+
+
+def synthetic_html(n_words, seed):
+    paragraphs = [f"<p>{synthetic_text(60, seed * 100 + i)}</p>" for i in range(max(1, n_words // 60))]
+    noise = '<script>var x = 1;</script><nav><p>Home | World | Sports</p></nav>' * 20
+    return f"<html><head>{noise}</head><body>{noise}{''.join(paragraphs)}</body></html>".encode('utf-8')
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+# Tiny offline models
+def _train_tiny_tokenizer(texts):
+    from tokenizers import ByteLevelBPETokenizer
+    from transformers import PreTrainedTokenizerFast
+
+    special = ['<s>', '<pad>', '</s>', '<unk>', '<mask>']
+    bpe = ByteLevelBPETokenizer()
+    bpe.train_from_iterator(texts, vocab_size=1000, special_tokens=special, show_progress=False)
+    return PreTrainedTokenizerFast(
+        tokenizer_object=bpe, bos_token='<s>', eos_token='</s>', pad_token='<pad>',
+        unk_token='<unk>', mask_token='<mask>', model_max_length=1024,
+    )
+
+
+def install_tiny_models():
+    """Registers tiny randomly initialized stand-ins for every model in the registry."""
+    import spacy
+    import torch
+    from transformers import (BartConfig, BartForConditionalGeneration, RobertaConfig,
+                              RobertaForSequenceClassification, pipeline)
+
+    # Stage modules register their real loaders on import; import them first so ours win
+    import app.category_classification  # noqa: F401
+    import app.sentiment_analysis  # noqa: F401
+    import app.summarization  # noqa: F401
+    import app.ner_extraction  # noqa: F401
+    from app.model_registry import registry
+
+    torch.manual_seed(0)
+    tokenizer = _train_tiny_tokenizer([synthetic_text(200, seed) for seed in range(50)])
+    roberta = dict(vocab_size=len(tokenizer), hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+                   intermediate_size=64, max_position_embeddings=1030, pad_token_id=tokenizer.pad_token_id)
+
+    def classifier(num_labels):
+        model = RobertaForSequenceClassification(RobertaConfig(num_labels=num_labels, **roberta))
+        return model.eval()
+
+    def summarizer():
+        config = BartConfig(vocab_size=len(tokenizer), d_model=32, encoder_layers=2, decoder_layers=2,
+                            encoder_attention_heads=2, decoder_attention_heads=2, encoder_ffn_dim=64,
+                            decoder_ffn_dim=64, max_position_embeddings=1024, pad_token_id=tokenizer.pad_token_id,
+                            bos_token_id=tokenizer.bos_token_id, eos_token_id=tokenizer.eos_token_id,
+                            decoder_start_token_id=tokenizer.eos_token_id, forced_bos_token_id=None)
+        model = BartForConditionalGeneration(config).eval()
+        return pipeline('summarization', model=model, tokenizer=tokenizer)
+
+    def spacy_with_people():
+        # No trained weights: sentence boundaries plus rule-based PERSON entities
+        nlp = spacy.blank('en')
+        nlp.add_pipe('sentencizer')
+        ruler = nlp.add_pipe('entity_ruler')
+        ruler.add_patterns([{'label': 'PERSON', 'pattern': name} for name in _NAMES])
+        return nlp
+
+    registry.register('category_classifier', lambda: (tokenizer, classifier(4)), version='tiny-random')
+    registry.register('sentiment', lambda: pipeline('sentiment-analysis', model=classifier(3), tokenizer=tokenizer),
+                      version='tiny-random')
+    registry.register('summarizer', summarizer, version='tiny-random')
+    registry.register('spacy_lg', spacy_with_people, version='tiny-blank')
+
+
+# Stage runners: each takes a list of inputs and processes them as one batch
+def _runner(stage, tiny=False):
+    if stage == 'html':
+        from app.html_extraction import extract_article_text
+        return lambda pages: [extract_article_text(page) for page in pages]
+    if stage == 'extractive':
+        from app.summarization import extractive_summarize_many
+        return extractive_summarize_many
+    if stage == 'abstractive':
+        from app.summarization import abstractive_summarize_batch
+        return lambda texts: abstractive_summarize_batch(texts, max_length=60, min_length=5, batch_size=len(texts))
+    if stage == 'classification':
+        from app.category_classification import classify_news_batch
+        return lambda texts: classify_news_batch(texts, batch_size=len(texts))
+    if stage == 'sentiment':
+        from app.sentiment_analysis import sentiment_analysis_batch
+        return lambda texts: sentiment_analysis_batch(texts, batch_size=len(texts))
+    from app.ner_extraction import analyze_stories
+    # The Stanza coreference model has no tiny stand-in
+    return lambda texts: analyze_stories(texts, batch_size=len(texts), coref=not tiny)
+
+
+def _inputs(stage, tier, count):
+    if stage == 'html':
+        pages = sorted(glob.glob(os.path.join(DEFAULT_CORPUS_DIR, '*.html')))
+        # Saved real pages are used for the full-article tier when available
+        if tier == 'full_article' and pages:
+            data = []
+            for path in pages:
+                with open(path, 'rb') as f:
+                    data.append(f.read())
+            return [data[i % len(data)] for i in range(count)]
+        return [synthetic_html(TIERS[tier], seed) for seed in range(count)]
+    return [synthetic_text(TIERS[tier], seed) for seed in range(count)]
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+# Measure computation, never cached results
+@result_cache_disabled()
+def run_benchmarks(stages=STAGES, tiers=tuple(TIERS), batch_sizes=(1, 8, 32), repeat=5, tiny=False):
+    """
+    Runs every (stage, tier, batch size) combination.
+
+    Returns:
+    - Dictionary with run metadata and a list of result rows.
+    """
+    if tiny:
+        install_tiny_models()
+
+    rows = []
+    for stage in stages:
+        run = _runner(stage, tiny)
+        for tier in tiers:
+            for batch_size in batch_sizes:
+                if stage == 'html' and batch_size != batch_sizes[0]:
+                    continue  # HTML extraction has no batched mode
+                batches = [_inputs(stage, tier, batch_size) for _ in range(repeat)]
+                run(batches[0])  # warm-up: model loading and first-call setup
+                latencies = []
+                for batch in batches:
+                    start = time.perf_counter()
+                    run(batch)
+                    latencies.append(time.perf_counter() - start)
+                total = sum(latencies)
+                row = {
+                    'stage': stage,
+                    'tier': tier,
+                    'batch_size': batch_size,
+                    'p50_ms': _percentile(latencies, 0.5) * 1000,
+                    'p95_ms': _percentile(latencies, 0.95) * 1000,
+                    'items_per_sec': batch_size * len(latencies) / total if total else None,
+                    'peak_rss_mb': peak_rss_mb(),
+                }
+                rows.append(row)
+                print(f"{stage:<15} {tier:<13} batch {batch_size:>3}  p50 {row['p50_ms']:9.2f} ms  "
+                      f"p95 {row['p95_ms']:9.2f} ms  {row['items_per_sec']:9.1f} items/s  "
+                      f"peak RSS {row['peak_rss_mb']:8.1f} MB")
+
+    return {
+        'meta': {
+            'tiny': tiny,
+            'repeat': repeat,
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': rows,
+    }
+
+
+def compare_results(baseline, current, tolerance=0.2):
+    """
+    Lists rows whose p50 latency grew by more than `tolerance` (0.2 = 20%) over the baseline.
+    """
+    key = lambda row: (row['stage'], row['tier'], row['batch_size'])
+    previous = {key(row): row for row in baseline['results']}
+    regressions = []
+    for row in current['results']:
+        old = previous.get(key(row))
+        if old and old['p50_ms'] > 0 and row['p50_ms'] > old['p50_ms'] * (1 + tolerance):
+            regressions.append((key(row), old['p50_ms'], row['p50_ms']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES))
+    parser.add_argument('--tiers', nargs='+', choices=list(TIERS), default=list(TIERS))
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=[1, 8, 32])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--tiny', action='store_true', help='Use tiny random models (no downloads)')
+    parser.add_argument('--output', help='Write results to this JSON file')
+    parser.add_argument('--compare', help='Baseline JSON file to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.stages, args.tiers, args.batch_sizes, args.repeat, args.tiny)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved results to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_results(baseline, report, args.tolerance)
+        for (stage, tier, batch_size), old, new in regressions:
+            print(f"REGRESSION {stage} {tier} batch {batch_size}: p50 {old:.2f} ms -> {new:.2f} ms")
+        if regressions:
+            sys.exit(1)
+        print("No regressions")
+
+
+if __name__ == "__main__":
+    main()
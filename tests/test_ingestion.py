@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from app import ingestion
+from app.dedup_index import DedupIndex
+from app.ingestion import NewsIngestor
+from app.news_api_stub import NewsApiStub
+
+TOPICS = ['central bank raises interest rates', 'striker scores late winner in derby',
+          'new battery chemistry doubles range', 'storm closes coastal roads overnight',
+          'museum reopens after long restoration']
+
+
+@pytest.fixture
+def stub(tmp_path):
+    path = tmp_path / 'articles.jsonl'
+    with open(path, 'w', encoding='utf-8') as f:
+        for i, topic in enumerate(TOPICS, start=1):
+            f.write(json.dumps({
+                'uuid': str(i),
+                'title': f'Story {i}',
+                'description': f'{topic} according to officials on day {i}',
+                'source': 'example.com',
+                'url': f'https://example.com/x/{i}',
+                'published_at': f'2024-01-01T00:0{i}:00',
+            }) + '\n')
+    server = NewsApiStub(str(path), port=0).start()
+    yield server
+    server.stop()
+
+
+def test_failed_page_loses_no_stories(stub, monkeypatch):
+    fetch_news_page = ingestion.fetch_news_page
+    failures = []
+
+    def flaky_fetch(query, api_key, page=1, *args, **kwargs):
+        if page == 2 and not failures:
+            failures.append(page)
+            raise RuntimeError('page 2 unavailable')
+        return fetch_news_page(query, api_key, page, *args, **kwargs)
+
+    monkeypatch.setattr(ingestion, 'fetch_news_page', flaky_fetch)
+    ingestor = NewsIngestor('', 'key', index=DedupIndex(':memory:'), limit=2, base_url=stub.url)
+
+    with pytest.raises(RuntimeError):
+        ingestor.poll_once()
+    assert len(ingestor.index) == 0
+
+    urls = [article['url'] for article in ingestor.poll_once()]
+    assert sorted(urls) == [f'https://example.com/x/{i}' for i in range(1, 6)]
+    assert ingestor.poll_once() == []